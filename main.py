@@ -18,6 +18,7 @@ def parse_args():
 
 	p.add_argument('--break', action='store_true', dest='breakpoints', help='Use breakpoints')
 	p.add_argument('--no-cpu-sleep', action='store_false', dest='sleep_cpu', help='Do not sleep CPU waiting for PPU to change')
+	p.add_argument('--no-debug-view', action='store_false', dest='debug_view', help='Start with debug view hidden (F1 toggles)')
 
 	p.set_defaults(verbosity=0)
 	mx = p.add_mutually_exclusive_group()
@@ -48,6 +49,7 @@ def main():
 		log_instructions_to_file=True,
 		log_instructions_to_stream=(args.verbosity >= 3),
 		render=(not args.headless),
+		debug_view=args.debug_view,
 	)
 
 	if args.stop_after_frames:
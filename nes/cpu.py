@@ -47,6 +47,19 @@ def make_instruction_logger(
 	return logger
 
 
+class _LazyStack:
+	"""
+	Stack contents for the instruction log, only formatted if the log record actually gets emitted
+	"""
+	__slots__ = ('cpu',)
+
+	def __init__(self, cpu: 'Cpu'):
+		self.cpu = cpu
+
+	def __str__(self) -> str:
+		return self.cpu._get_stack_str()
+
+
 def _signed(val: uint8) -> int8:
 	"""
 	Convert unsigned 8-bit to signed 8-bit
@@ -101,6 +114,8 @@ class Cpu:
 		self.stop_on_rti: bool = stop_on_rti
 
 		self.ram: Final[bytearray] = bytearray(2048)
+		# Optimization: zero-copy view of RAM, for OAM DMA
+		self._ram_view: Final[memoryview] = memoryview(self.ram)
 
 		logging.debug(f'len(rom_prg)=0x{len(rom_prg):04X}')
 
@@ -119,12 +134,13 @@ class Cpu:
 		self.x: uint8 = 0
 		self.y: uint8 = 0
 
-		self.n: bool = False
-		self.v: bool = False
-		self.d: bool = False
-		self.i: bool = True
-		self.z: bool = False
-		self.c: bool = False
+		# Flags may be bool or int 0/1 (int where that's cheaper to compute)
+		self.n: bool | int = False
+		self.v: bool | int = False
+		self.d: bool | int = False
+		self.i: bool | int = True
+		self.z: bool | int = False
+		self.c: bool | int = False
 
 		self.vblank_needs_handling: bool = False
 		self.vblank_end_needs_handling: bool = False
@@ -137,10 +153,15 @@ class Cpu:
 		self.sleep_on_branch_loop = sleep_on_branch_loop
 		self.branch_loop_cache = None
 
+		# PC of an instruction that jumps to itself, which we've already determined is sleeping (and its cycle count)
+		self._sleep_pc: int | None = None
+		self._sleep_pc_cycles: int = 0
+
 		self.instruction_logger = make_instruction_logger(
 			to_file=log_instructions_to_file,
 			to_stream=log_instructions_to_stream,
 		)
+		self._lazy_stack_str = _LazyStack(self)
 
 		# These are just for debugging
 		self.clock: int = 0
@@ -151,23 +172,23 @@ class Cpu:
 	@property
 	def sr(self) -> uint8:
 		return (
-			int(self.n) << 7 |
-			int(self.v) << 6 |
+			self.n << 7 |
+			self.v << 6 |
 			0b0010_0000 |  # This bit always set
-			int(self.d) << 3 |
-			int(self.i) << 2 |
-			int(self.z) << 1 |
-			int(self.c)
+			self.d << 3 |
+			self.i << 2 |
+			self.z << 1 |
+			self.c
 		)
 
 	@sr.setter
 	def sr(self, sr: uint8) -> None:
-		self.n = bool(sr & 0b1000_0000)
-		self.v = bool(sr & 0b0100_0000)
-		self.d = bool(sr & 0b0000_1000)
-		self.i = bool(sr & 0b0000_0100)
-		self.z = bool(sr & 0b0000_0010)
-		self.c = bool(sr & 0b0000_0001)
+		self.n = (sr >> 7) & 1
+		self.v = (sr >> 6) & 1
+		self.d = (sr >> 3) & 1
+		self.i = (sr >> 2) & 1
+		self.z = (sr >> 1) & 1
+		self.c = sr & 1
 
 	def sr_str(self) -> str:
 		return (
@@ -181,7 +202,10 @@ class Cpu:
 
 	# Branch loop cache
 
-	def on_branch_check_loop(self):
+	def on_branch_check_loop(self) -> bool:
+		"""
+		:returns: True if slept
+		"""
 
 		# Optimization: if repeatedly branching and no CPU status has changed (branch_loop_cache also gets cleared on
 		# any memory write), then we must be in a loop waiting for change from PPU, so we can skip emulating the CPU
@@ -197,8 +221,11 @@ class Cpu:
 			if self.instruction_logger:
 				self.instruction_logger.debug('Sleeping until PPUSTATUS changes')
 			self.ppu.tick_until_ppustatus_change()
+			self.branch_loop_cache = branch_loop_cache_new
+			return True
 
 		self.branch_loop_cache = branch_loop_cache_new
+		return False
 
 	# Read & write memory
 
@@ -241,6 +268,7 @@ class Cpu:
 		assert 0 <= addr < 65536, f'Invalid address: {addr}'
 
 		self.branch_loop_cache = None
+		self._sleep_pc = None
 
 		if addr == 0x4014:
 			# OAMDMA
@@ -277,7 +305,7 @@ class Cpu:
 		if page < 0x20:
 			start = (page * 256) & 0x7FF
 			end = start + 256
-			self.ppu.oam_dma(self.ram[start:end])
+			self.ppu.oam_dma(self._ram_view[start:end])
 		else:
 			raise NotImplementedError('OAM DMA from memory outside RAM is not currently supported')
 
@@ -544,6 +572,7 @@ class Cpu:
 
 	def _handle_nmi(self) -> None:
 		# https://www.nesdev.org/wiki/CPU_interrupts#IRQ_and_NMI_tick-by-tick_execution
+		self._sleep_pc = None
 		self.push16(self.pc)
 		self.push(self.sr & 0b1110_1111)
 		self.pc = self.nmi
@@ -569,6 +598,15 @@ class Cpu:
 			if self.stop_on_vblank_end:
 				return True
 
+		if self.pc == self._sleep_pc:
+			# Optimization: an instruction that jumps to itself can't observe any change, so once we've determined it's
+			# sleeping, skip straight to sleeping again without decoding it or going through on_branch_check_loop()
+			if self.instruction_logger:
+				self.instruction_logger.debug('Sleeping until PPUSTATUS changes')
+			self.ppu.tick_until_ppustatus_change()
+			self._tick_clock(self._sleep_pc_cycles)
+			return False
+
 		hit_breakpoint = False
 
 		clock_was = self.clock
@@ -582,6 +620,10 @@ class Cpu:
 		# If set, then Z & N flags will be updated
 		result = None
 
+		# Optimization: accumulator is read & written many times in the match below, so use a local and write back after.
+		# X, Y, PC & flags stay as members, since the addressing & stack functions use them
+		a = self.a
+
 		# TODO: use f-strings in more places, for more descriptive logging (self._addr_instr_log)
 		instr_log = ''
 		branched = None
@@ -624,74 +666,74 @@ class Cpu:
 						cycles = 6
 						value = self._addr_indirect_y_val()
 
-				result = self.a + value + int(self.c)
-				self.c = (result > 255)
-				self.v = bool((result ^ self.a) & (result ^ value) & 0x80)
-				self.a = result = (result & 0xFF)
+				result = a + value + self.c
+				self.c = result >> 8
+				self.v = ((result ^ a) & (result ^ value) & 0x80) >> 7
+				a = result = (result & 0xFF)
 
 			case 0x29:
 				# AND #oper
 				instr_log = 'AND'
 				cycles = 2
 				val = self._addr_immediate()
-				self.a &= val
-				result = self.a
+				a &= val
+				result = a
 
 			case 0x25:
 				# AND oper
 				instr_log = 'AND'
 				cycles = 3
-				self.a &= self._addr_zeropage_val()
-				result = self.a
+				a &= self._addr_zeropage_val()
+				result = a
 
 			case 0x35:
 				# AND oper,X
 				instr_log = 'AND'
 				cycles = 4
-				self.a &= self._addr_zeropage_x_val()
-				result = self.a
+				a &= self._addr_zeropage_x_val()
+				result = a
 
 			case 0x2D:
 				# AND oper
 				instr_log = 'AND'
 				cycles = 4
-				self.a &= self._addr_absolute_val()
-				result = self.a
+				a &= self._addr_absolute_val()
+				result = a
 
 			case 0x3D:
 				# AND oper,X
 				instr_log = 'AND'
 				cycles = 4
-				self.a &= self._addr_absolute_x_val()
-				result = self.a
+				a &= self._addr_absolute_x_val()
+				result = a
 
 			case 0x39:
 				# AND oper,y
 				instr_log = 'AND'
 				cycles = 4
-				self.a &= self._addr_absolute_y_val()
-				result = self.a
+				a &= self._addr_absolute_y_val()
+				result = a
 
 			case 0x21:
 				# AND (oper,X)
 				instr_log = 'AND'
 				cycles = 6
-				self.a &= self._addr_indirect_x_val()
-				result = self.a
+				a &= self._addr_indirect_x_val()
+				result = a
 
 			case 0x31:
 				# AND (oper),Y
 				instr_log = 'AND'
 				cycles = 5
-				self.a &= self._addr_indirect_y_val()
-				result = self.a
+				a &= self._addr_indirect_y_val()
+				result = a
 
 			case 0x0A:
 				# ASL
 				instr_log = 'ASL'
 				cycles = 2
-				self.c = bool(self.a & 0b1000_0000)
-				result = self.a = (self.a << 1) & 0xFF
+				self.c = a >> 7
+				result = a = (a << 1) & 0xFF
 
 			case 0x06 | 0x16 | 0x0E | 0x1E:
 				instr_log = 'ASL'
@@ -709,7 +751,7 @@ class Cpu:
 						cycles = 7
 						addr = self._addr_absolute_x_addr()
 				value = self.read(addr)
-				self.c = bool(value & 0b1000_0000)
+				self.c = value >> 7
 				result = (value << 1) & 0xFF
 				self.write(addr, result)
 
@@ -758,9 +800,9 @@ class Cpu:
 				else:
 					cycles = 4
 					value = self._addr_absolute_val()
-				self.v = bool(value & 0b0100_0000)
-				self.n = bool(value & 0b1000_0000)
-				self.z = (self.a & value) == 0
+				self.v = (value >> 6) & 1
+				self.n = value >> 7
+				self.z = (a & value) == 0
 
 			case 0x30:
 				# BMI rel
@@ -886,8 +928,8 @@ class Cpu:
 					case 0xD1:
 						cycles = 5
 						value = self._addr_indirect_y_val()
-				self.c = (self.a >= value)
-				result = (self.a - value) % 256
+				self.c = (a >= value)
+				result = (a - value) % 256
 				assert 0 <= result < 256
 
 			case 0xE0 | 0xE4 | 0xEC:
@@ -978,7 +1020,7 @@ class Cpu:
 					case 0x51:
 						cycles = 5
 						value = self._addr_indirect_y_val()
-				result = self.a = self.a ^ value
+				result = a = a ^ value
 
 			case 0xE6:
 				# INC oper (zeropage)
@@ -1072,7 +1114,7 @@ class Cpu:
 					case 0xB1:
 						cycles = 5
 						result = self._addr_indirect_y_val()
-				self.a = result
+				a = result
 
 			case 0xA2:
 				# LDX #oper
@@ -1138,9 +1180,9 @@ class Cpu:
 				# LSR
 				instr_log = 'LSR'
 				cycles = 2
-				val = self.a
+				val = a
 				self.c = val & 0x1
-				result = self.a = (val >> 1)
+				result = a = (val >> 1)
 
 			case 0x46 | 0x56 | 0x4E | 0x5E:
 				# LSR
@@ -1196,13 +1238,13 @@ class Cpu:
 					case 0x11:
 						cycles = 5
 						val = self._addr_indirect_y_val()
-				result = self.a = (val | self.a)
+				result = a = (val | a)
 
 			case 0x48:
 				# PHA
 				instr_log = 'PHA'
 				cycles = 3
-				self.push(self.a)
+				self.push(a)
 
 			case 0x08:
 				# PHP
@@ -1214,7 +1256,7 @@ class Cpu:
 				# PLA
 				instr_log = 'PLA'
 				cycles = 4
-				result = self.a = self.pull()
+				result = a = self.pull()
 
 			case 0x28:
 				# PLP
@@ -1226,8 +1268,8 @@ class Cpu:
 				# ROL
 				instr_log = 'ROL'
 				cycles = 2
-				c_new = bool(self.a & 0b1000_0000)
-				result = self.a = ((self.a << 1) | int(self.c)) & 0xFF
+				c_new = a >> 7
+				result = a = ((a << 1) | self.c) & 0xFF
 				self.c = c_new
 
 			case 0x26 | 0x36 | 0x2E | 0x3E:
@@ -1247,8 +1289,8 @@ class Cpu:
 						cycles = 7
 						addr = self._addr_absolute_x_addr()
 				value = self.read(addr)
-				c_new = bool(value & 0b1000_0000)
-				result = ((value << 1) | (1 if self.c else 0)) & 0xFF
+				c_new = value >> 7
+				result = ((value << 1) | self.c) & 0xFF
 				self.write(addr, result)
 				self.c = c_new
 
@@ -1256,8 +1298,8 @@ class Cpu:
 				# ROR
 				instr_log = 'ROR'
 				cycles = 2
-				c_new = (self.a & 0x01)
-				result = self.a = ((self.a >> 1) | (0b1000_0000 if self.c else 0)) & 0xFF
+				c_new = (a & 0x01)
+				result = a = ((a >> 1) | (self.c << 7)) & 0xFF
 				self.c = c_new
 
 			case 0x66 | 0x76 | 0x6E | 0x7E:
@@ -1278,7 +1320,7 @@ class Cpu:
 						addr = self._addr_absolute_x_addr()
 				value = self.read(addr)
 				c_new = (value & 0x01)
-				result = ((value >> 1) | (0b1000_0000 if self.c else 0)) & 0xFF
+				result = ((value >> 1) | (self.c << 7)) & 0xFF
 				self.write(addr, result)
 				self.c = c_new
 
@@ -1325,11 +1367,11 @@ class Cpu:
 						cycles = 5
 						value = self._addr_indirect_y_val()
 				nvalue = (~value) & 0xFF
-				result = self.a + nvalue + int(self.c)
-				self.c = result >= 256
-				result %= 256
-				self.v = bool((result ^ self.a) & (result ^ nvalue) & 0x80)
-				self.a = result
+				result = a + nvalue + self.c
+				self.c = result >> 8
+				result &= 0xFF
+				self.v = ((result ^ a) & (result ^ nvalue) & 0x80) >> 7
+				a = result
 
 			case 0x38:
 				# SEC
@@ -1374,7 +1416,7 @@ class Cpu:
 					case 0x91:
 						cycles = 6
 						addr = self._addr_indirect_y_addr()
-				self.write(addr, self.a)
+				self.write(addr, a)
 
 			case 0x86:
 				# STX oper
@@ -1422,13 +1464,13 @@ class Cpu:
 				# TAX
 				instr_log = 'TAX'
 				cycles = 2
-				result = self.x = self.a
+				result = self.x = a
 
 			case 0xA8:
 				# TAY
 				instr_log = 'TAY'
 				cycles = 2
-				result = self.y = self.a
+				result = self.y = a
 
 			case 0xBA:
 				# TSX
@@ -1440,7 +1482,7 @@ class Cpu:
 				# TXA
 				instr_log = 'TXA'
 				cycles = 2
-				result = self.a = self.x
+				result = a = self.x
 
 			case 0x9A:
 				# TXS
@@ -1452,7 +1494,7 @@ class Cpu:
 				# TYA
 				instr_log = 'TYA'
 				cycles = 2
-				result = self.a = self.y
+				result = a = self.y
 
 			case 0x02 | 0x12 | 0x22 | 0x32 | 0x42 | 0x52 | 0x62 | 0x72 | 0x92 | 0xB2 | 0xD2 | 0xF2:
 				raise Exception(f'Invalid instruction (JAM): 0x{opcode:02X} (at 0x{pc_was:04X})')
@@ -1460,27 +1502,36 @@ class Cpu:
 			case _:
 				raise NotImplementedError(f'CPU instruction 0x{opcode:02X} not implemented (at 0x{pc_was:04X})')
 
+		# Optimization: write back the accumulator local (see above)
+		self.a = a
+
 		if result is not None:
 			self.z = (result == 0)
-			self.n = bool(result & 0b1000_0000)
+			self.n = result >> 7
 
 		if self.sleep_on_branch_loop:
 
 			# TODO: Some games (e.g. Donkey Kong) tick RNG during main, so they won't sleep; see if there's a way to
 			# still optimize this
 
+			slept = False
+
 			if branched is not None:
 				if branched:
-					self.on_branch_check_loop()
+					slept = self.on_branch_check_loop()
 				else:
 					# Clear branch_loop_cache on any not-taken branch, just to be safe (not sure if this is really necessary?)
 					self.branch_loop_cache = None
 			elif self.pc == pc_was:
 				# e.g. "EndlessLoop: jmp EndlessLoop" as in Super Mario Bros
 				# TODO: this might be overkill, we might be able to skip the cache and jump straight to tick_until_ppustatus_change()
-				self.on_branch_check_loop()
+				slept = self.on_branch_check_loop()
 
-		if self.instruction_logger:
+			if slept and self.pc == pc_was:
+				self._sleep_pc = pc_was
+				self._sleep_pc_cycles = cycles
+
+		if self.instruction_logger is not None and self.instruction_logger.isEnabledFor(logging.DEBUG):
 
 			# TODO: is it better to auto indent based on stack pointer, or manual inc/dec based on interrupts/JSR/RTI/RTS?
 			num_indent = (256 - sp_was) % 32
@@ -1491,31 +1542,35 @@ class Cpu:
 			if self._addr_instr_log:
 				instr_log += ' ' + self._addr_instr_log
 
-			msg = (
-				f'{self.ppu.frame_count}, ({self.ppu.row:3}, {self.ppu.col:3}); '
-				f'pc=0x{pc_was:04X}, instr=0x{opcode:02X}, {indent + instr_log:48}'
-				f'{self.sr_str()}'
-			)
+			# Optimization: pass args separately so logging only does the formatting if the record is actually handled
+
+			fmt = '%d, (%3d, %3d); pc=0x%04X, instr=0x%02X, %-48s%s'
+			args = [self.ppu.frame_count, self.ppu.row, self.ppu.col, pc_was, opcode, indent + instr_log, self.sr_str()]
 
 			if LOG_REGISTERS:
-				msg += f' a=0x{self.a:02X} x=0x{self.x:02X} y=0x{self.y:02X} sp={self.sp:3}'
+				fmt += ' a=0x%02X x=0x%02X y=0x%02X sp=%3d'
+				args += [self.a, self.x, self.y, self.sp]
 
 			if LOG_STACK:
-				msg += self._get_stack_str()
+				fmt += '%s'
+				args.append(self._lazy_stack_str)
 
 			# if branched is not None:
 			# 	msg += ' (branched)' if branched else ' (no branch)'
 
 			if result is not None:
-				msg += f' (result=0x{result:02X})'
+				fmt += ' (result=0x%02X)'
+				args.append(result)
 
 			if sp != sp_was:
-				msg += f'; SP {sp_was} -> {sp}'
+				fmt += '; SP %d -> %d'
+				args += [sp_was, sp]
 
 			if not 1 <= (self.pc - pc_was) <= 3:
-				msg += f'; PC ${pc_was:04X} -> ${self.pc:04X}'
+				fmt += '; PC $%04X -> $%04X'
+				args += [pc_was, self.pc]
 
-			self.instruction_logger.debug(msg)
+			self.instruction_logger.debug(fmt, *args)
 
 		# TODO: technically, this should happen before result happens
 		self._tick_clock(cycles)
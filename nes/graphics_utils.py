@@ -16,22 +16,11 @@ def grey_to_rgb(arr: np.ndarray) -> np.ndarray:
 	return np.dstack([arr, arr, arr])
 
 
-def upscale(arr: np.ndarray, scale: int | tuple[int, int]) -> np.ndarray:
+def array_to_surface(arr: np.ndarray, into=None):
 	"""
-	Nearest-neighbour upscaling
+	:note: does not upscale; to upscale, scale the resulting surface with pygame.transform.scale (as in
+	Ui._update_scaled_surface)
 	"""
-	if isinstance(scale, int):
-		scale = (scale, scale)
-	return arr.repeat(scale[0], 0).repeat(scale[1], 1)
-
-
-_upscale = upscale
-
-
-def array_to_surface(arr: np.ndarray, upscale: int | tuple[int, int] = 1, into=None):
-	if (not isinstance(upscale, int)) or (upscale > 1):
-		arr = _upscale(arr, upscale)
-
 	arr = arr.swapaxes(1,0)
 
 	if into is None:
@@ -99,29 +88,10 @@ def chr_to_array(rom_chr: bytes, width=16) -> np.ndarray:
 	if (height * width) != 512:
 		raise ValueError(f'width must be divisor of 512: {width}')
 
-	# TODO: use numpy operations for this instead of 3 nested loops
-
-	chr_arr = np.empty((8*height, 8*width), dtype=np.uint8)
-	for tile_idx in range(512):
-
-		tile_y, tile_x = divmod(tile_idx, width)
-		tile_x *= 8
-		tile_y *= 8
-
-		for row in range(8):
-			low_byte = rom_chr[16 * tile_idx + row]
-			high_byte = rom_chr[16 * tile_idx + row + 8]
-			for col in range(8):
-
-				mask = (1 << (7 - col))
-
-				low_bit = int(bool(low_byte & mask))
-				high_bit = int(bool(high_byte & mask))
-				pixel = low_bit + 2 * high_bit
+	tiles_8x8 = chr_to_stacked(rom_chr)
 
-				chr_arr[tile_y + row, tile_x + col] = pixel
-
-	return chr_arr
+	# (512, 8, 8) -> (height, width, 8, 8) -> (height, 8, width, 8), which is the same memory layout as final shape
+	return tiles_8x8.reshape((height, width, 8, 8)).transpose((0, 2, 1, 3)).reshape((8*height, 8*width))
 
 
 def chr_to_stacked(rom_chr: bytes, tall=False) -> np.ndarray:
@@ -132,28 +102,35 @@ def chr_to_stacked(rom_chr: bytes, tall=False) -> np.ndarray:
 	OAM byte 1 as index
 	"""
 
+	# Each tile is 16 bytes: 8 bytes of low bitplane, then 8 bytes of high bitplane
+	# https://www.nesdev.org/wiki/PPU_pattern_tables
+	# Optimization: unpack all bits at once (MSB first, which is leftmost pixel), then combine the planes
+	planes = np.unpackbits(np.frombuffer(rom_chr, dtype=np.uint8, count=512*16).reshape((512, 2, 8, 1)), axis=3)
+
 	# TODO optimization: I suspect (512, 8, 8) is faster than (8, 8, 512), but confirm (try both and compare performance)
-	tiles_8x8 = chr_to_array(rom_chr, width=1).reshape((512, 8, 8)).copy()
+	tiles_8x8 = planes[:, 0] | (planes[:, 1] << 1)
 
 	if tall:
-		# Could numpy optimize this, but it only happens on load, so not a high priority
-		tiles_8x16 = np.empty((256, 16, 8), dtype=np.uint8)
+		return tiles_8x8_to_8x16(tiles_8x8)
+	else:
+		return tiles_8x8
 
-		for idx_out in range(256):
-			# In 8x16 mode, there's some bit shuffling needed to get tile index
-			# https://www.nesdev.org/wiki/PPU_OAM#Byte_1
-			# Do it once now rather than every time we render a sprite later
-			low_bit = (idx_out & 1)
-			high_bits = idx_out & 0b1111_1110
-			idx_in = 256 * low_bit + high_bits
 
-			tiles_8x16[idx_out, :8, :] = tiles_8x8[idx_in    , :, :]
-			tiles_8x16[idx_out, 8:, :] = tiles_8x8[idx_in + 1, :, :]
+def tiles_8x8_to_8x16(tiles_8x8: np.ndarray) -> np.ndarray:
+	"""
+	Combine pairs of 8x8 tiles into 8x16 tiles
 
-		return tiles_8x16
+	:param tiles_8x8: shape (512, 8, ...), e.g. (512, 8, 8) from chr_to_stacked() (any dtype)
+	:returns: shape (256, 16, ...), in the same order as chr_to_stacked(tall=True)
+	"""
 
-	else:
-		return tiles_8x8
+	# In 8x16 mode, there's some bit shuffling needed to get tile index
+	# https://www.nesdev.org/wiki/PPU_OAM#Byte_1
+	# Do it once now rather than every time we render a sprite later
+	idx_out = np.arange(256)
+	idx_in = 256 * (idx_out & 1) + (idx_out & 0b1111_1110)
+
+	return np.concatenate((tiles_8x8[idx_in], tiles_8x8[idx_in + 1]), axis=1)
 
 
 def load_palette_file(path: Path | str) -> np.ndarray:
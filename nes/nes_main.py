@@ -92,7 +92,11 @@ class Nes:
 			log_instructions_to_file: bool = False,
 			log_instructions_to_stream: bool = False,
 			render: bool = True,
+			debug_view: bool = True,
 			):
+		"""
+		:param debug_view: start with debug view shown (only if render); debug images are only updated while it's shown
+		"""
 
 		if rom.header.mapper != 0:
 			raise NotImplementedError(f'Only mapper 0 is implemented (ROM has mapper {rom.header.mapper})')
@@ -106,6 +110,7 @@ class Nes:
 			rom_chr=self.rom.chr,
 			rom_header=self.rom.header,
 			render_callback=self._render,
+			debug=(render and debug_view),
 		)
 
 		self.cpu = Cpu(
@@ -134,6 +139,7 @@ class Nes:
 			self.ui = Ui(
 				controllers=self.controllers,
 				renderer=self.renderer,
+				debug_view=debug_view,
 			)
 			self.timer = PerformanceTimer()
 
@@ -141,7 +147,8 @@ class Nes:
 
 	def _render(self, frame_idx: int, start_row: int, end_row: int) -> None:
 
-		self.timer.checkin('Emu')
+		if self.timer:
+			self.timer.checkin('Emu')
 
 		if end_row <= start_row:
 			raise ValueError(f'{end_row=} must be > {start_row=}')
@@ -204,20 +211,31 @@ class Nes:
 				self.ui.handle_events()
 				timer.checkin('Events')
 
+				# Optimization: only do debug work while debug view is shown
+				# (Updated here, between frames, so a frame never has debug enabled for only some segments)
+				if self.ui.debug_view != self.ppu.debug_enabled:
+					self.ppu.debug_enabled = self.ui.debug_view
+
 				timer.end_frame()
 
 		else:
 
+			process_instruction = self.cpu.process_instruction
 			while True:
-				if self.cpu.process_instruction():
+				if process_instruction():
 					self._handle_breakpoint()
 
 	def run_until_next_vblank_start(self):
 
-		while self.ppu.vblank:
-			if self.cpu.process_instruction():
-				self._handle_breakpoint()
+		# Optimization: the loops below run once per CPU instruction, so bind everything they need to locals
+		ppu = self.ppu
+		process_instruction = self.cpu.process_instruction
+		handle_breakpoint = self._handle_breakpoint
+
+		while ppu.vblank:
+			if process_instruction():
+				handle_breakpoint()
 
-		while not self.ppu.vblank:
-			if self.cpu.process_instruction():
-				self._handle_breakpoint()
+		while not ppu.vblank:
+			if process_instruction():
+				handle_breakpoint()
@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 
+from functools import partial
 from math import ceil
 import logging
 from typing import Callable, Final
 
 import numpy as np
 
-from nes.graphics_utils import chr_to_array, chr_to_stacked, grey_to_rgb, load_palette_file, upscale, draw_rectangle
+from nes.graphics_utils import chr_to_array, tiles_8x8_to_8x16, grey_to_rgb, load_palette_file, draw_rectangle
 from nes.rom import INesHeader
 from nes.types import uint8, pointer16
 
@@ -24,6 +25,9 @@ VBLANK_START_ROW: Final[int] = 240
 VBLANK_END_ROW: Final[int] = 260
 TOTAL_ROWS: Final[int] = 262
 
+# Number of rows an OAM DMA spans (513 CPU cycles)
+OAM_DMA_ROW_COUNT: Final[int] = ceil(513 * 3 / COLUMNS)
+
 NAMETABLE_A_VRAM_START: Final[pointer16] = 0x000
 NAMETABLE_B_VRAM_START: Final[pointer16] = 0x400
 
@@ -34,22 +38,81 @@ NAMETABLE_LAYOUT_VERTICAL: Final[tuple[int, int, int, int]] = (
 
 SPRITE_ZERO_HIT_NONE: Final[tuple[int, int]] = (TOTAL_ROWS + 1, COLUMNS)
 
+# Value of Ppu._sprite_zero_check_row when not waiting for sprite zero hit (i.e. a row that is never reached)
+_SPRITE_ZERO_CHECK_NEVER: Final[int] = SPRITE_ZERO_HIT_NONE[0]
+
+# Palette RAM index for each address in $3F00-$3F1F (masked to $00-$1F)
+# Palette entry 0 is shared between sprite & BG, so $3F10/$3F14/$3F18/$3F1C mirror $3F00/$3F04/$3F08/$3F0C
+_PALETTE_RAM_INDEX_LUT: Final[bytes] = bytes(
+	(idx - 0x10) if (idx >= 0x10 and idx % 4 == 0) else idx for idx in range(0x20)
+)
+
+
+# Bit-reversal of every byte, i.e. horizontally flip a row of 8 pixels (for use with bytes.translate)
+_REVERSE_BITS: Final[bytes] = bytes(int(f'{val:08b}'[::-1], 2) for val in range(256))
+
+# 0x0101...01 for 8 & 16 rows; multiply by a byte value to repeat it in every row of a packed tile
+_PACKED_ROWS_ONES: Final[dict[int, int]] = {height: int.from_bytes(b'\x01' * height, 'big') for height in (8, 16)}
+
+# Mask to apply to a packed tile when PPUMASK hides the left 8 pixels, for 8 & 16 rows, indexed by screen X of the
+# tile's left column + 7 (i.e. screen X from -7 to 255)
+_LEFT_8_PIXELS_HIDDEN_MASKS: Final[dict[int, tuple[int, ...]]] = {
+	height: tuple(ones * (0xFF >> max(0, 8 - screen_x)) for screen_x in range(-7, 256))
+	for height, ones in _PACKED_ROWS_ONES.items()
+}
+
+
+def _chr_to_packed_tile_rows(rom_chr: bytes) -> np.ndarray:
+	"""
+	Pack CHR tile masks 1 byte per row, where each bit is whether that pixel is opaque (MSB is leftmost pixel)
+
+	:returns: shape (512, 8)
+	"""
+	# Each tile is 8 bytes of low bitplane followed by 8 bytes of high bitplane; a pixel is opaque if either bit is set,
+	# so there's no need to decode individual pixels
+	planes = np.frombuffer(rom_chr, dtype=np.uint8, count=512 * 16).reshape((512, 2, 8))
+	return planes[:, 0, :] | planes[:, 1, :]
+
+
+def _flip_tile_rows(tiles: tuple[bytes, ...]) -> tuple[tuple[bytes, ...], ...]:
+	"""
+	Pre-calculate every flipped version of packed tiles
+
+	:returns: 4 tuples of tiles, indexed by sprite flags >> 6 (i.e. bit 1 = vertical flip, bit 0 = horizontal flip)
+	"""
+	flipped_h = tuple(tile.translate(_REVERSE_BITS) for tile in tiles)
+	return (
+		tiles,
+		flipped_h,
+		tuple(tile[::-1] for tile in tiles),
+		tuple(tile[::-1] for tile in flipped_h),
+	)
+
+
+def _unpack_tile_rows(tile_rows: bytes) -> np.ndarray:
+	"""
+	Unpack a single tile (or column of tiles) from _chr_to_packed_tile_rows into a bool array
+	"""
+	return np.unpackbits(np.frombuffer(tile_rows, dtype=np.uint8)).reshape((len(tile_rows), 8)).astype(np.bool)
+
 
 def _sprite_zero_hit_load_sprite(
 		*,
 		oam: bytes | bytearray,
 		ppuctrl: uint8,
-		chr_tiles_8x8: np.ndarray,
-		chr_tiles_8x16: np.ndarray,
-		empty_tiles_8x8: list[bool],
-		empty_tiles_8x16: list[bool],
-		) -> tuple[np.ndarray, int, int] | tuple[None, None, None]:
+		chr_tiles_8x8: tuple[tuple[bytes, ...], ...],
+		chr_tiles_8x16: tuple[tuple[bytes, ...], ...],
+		empty_tiles_8x8: tuple[bool, ...],
+		empty_tiles_8x16: tuple[bool, ...],
+		) -> tuple[bytes, int, int] | tuple[None, None, None]:
 	"""
 	Load sprite 0, and flip according to sprite flags
 
-	As an optimization, this takes a pre-calculated list of empty tiles
+	As an optimization, this takes pre-calculated arrays of which tiles are empty, and pre-flipped tiles (see
+	_flip_tile_rows)
 
 	:returns: (tile, X, Y) if sprite is in-bounds and non-empty; (None, None, None) otherwise
+		tile is packed 1 byte per row (see _chr_to_packed_tile_rows)
 	"""
 
 	# Sprite Y values are offset by 1 (https://www.nesdev.org/wiki/PPU_OAM#Byte_0)
@@ -76,13 +139,7 @@ def _sprite_zero_hit_load_sprite(
 		logger.debug('Sprite zero hit: sprite zero is empty, no hit')
 		return None, None, None
 
-	sprite_tile = chr_tiles[sprite_tile_idx]
-
-	if sprite_flags & 0b1000_0000:
-		sprite_tile = np.flipud(sprite_tile)
-
-	if sprite_flags & 0b0100_0000:
-		sprite_tile = np.fliplr(sprite_tile)
+	sprite_tile = chr_tiles[sprite_flags >> 6][sprite_tile_idx]
 
 	return sprite_tile, sprite_x, sprite_y
 
@@ -92,93 +149,102 @@ def _sprite_zero_hit_render_background_region(
 		ppuctrl: uint8,
 		vram: bytes | bytearray,
 		vertical_mirroring: bool,
-		chr_tiles_8x8: np.ndarray,
+		chr_tiles_8x8: tuple[bytes, ...],
 		first_tile_x: int,
 		first_tile_y: int,
-		) -> np.ndarray:
+		) -> tuple[bytes, bytes]:
+	"""
+	:returns: (left column, right column) of background region, each packed 1 byte per row (see _chr_to_packed_tile_rows);
+		16 rows for 8x8 sprites, 24 rows for 8x16 sprites
+	"""
 
 	sprites_8x16 = bool(ppuctrl & 0b0010_0000)
-	bg_pattern_table_select = bool(ppuctrl & 0b0001_0000)
+	bg_pattern_table_offset = 256 if (ppuctrl & 0b0001_0000) else 0
+	num_tiles_y = 3 if sprites_8x16 else 2
 
-	nametable_a = np.frombuffer(vram[ : 960], dtype=np.uint8).reshape((30, 32))
-	nametable_b = np.frombuffer(vram[ 0x400 : 0x400 + 960 ], dtype=np.uint8).reshape((30, 32))
+	# Optimization: PPUCTRL nametable select doesn't depend on tile, so calculate it outside the loop
+	nametable_select = bool(ppuctrl & (0b0000_0010 if vertical_mirroring else 0b0000_0001))
 
-	bg_region = np.zeros((24 if sprites_8x16 else 16, 16), dtype=np.bool)
+	# Optimization: there are only 4-6 tiles, so looping in Python is faster than vectorizing the tile gather (numpy
+	# per-call overhead outweighs it at this size). Tile indices are read straight from VRAM.
+	# Optimization: there are always exactly 2 columns, so unroll them, and calculate everything that only depends on
+	# column outside the loop
 
-	# TODO optimization: if sprite_x_within_region or sprite_y_within_region is 0, can iterate 1 less in that dimension
-	for y in range(3 if sprites_8x16 else 2):
-		tile_y = first_tile_y + y
-		for x in range(2):
-			tile_x = first_tile_x + x
-
-			if vertical_mirroring:
-				pick_b = bool(ppuctrl & 0b0000_0010)
-				if tile_y >= 30:
-					pick_b = not pick_b
-			else:
-				pick_b = bool(ppuctrl & 0b0000_0001)
-				if tile_x >= 32:
-					pick_b = not pick_b
-
-			nametable_tile_y = tile_y % 30
-			nametable_tile_x = tile_x % 32
-			nametable = nametable_b if pick_b else nametable_a
+	tile_x_left = first_tile_x
+	tile_x_right = first_tile_x + 1
 
-			bg_tile_idx = int(nametable[nametable_tile_y, nametable_tile_x])
+	if not vertical_mirroring:
+		nametable_select_left = nametable_select ^ (tile_x_left >= 32)
+		nametable_select_right = nametable_select ^ (tile_x_right >= 32)
+		vram_addr_left = (NAMETABLE_B_VRAM_START if nametable_select_left else NAMETABLE_A_VRAM_START) + (tile_x_left % 32)
+		vram_addr_right = (NAMETABLE_B_VRAM_START if nametable_select_right else NAMETABLE_A_VRAM_START) + (tile_x_right % 32)
 
-			if bg_pattern_table_select:
-				bg_tile_idx += 256
+	column_left = []
+	column_right = []
 
-			bg_tile = chr_tiles_8x8[bg_tile_idx]
-			bg_region[8*y : 8*y + 8, 8*x : 8*x + 8] = bg_tile
+	# TODO optimization: if sprite_x_within_region or sprite_y_within_region is 0, can iterate 1 less in that dimension
+	for tile_y in range(first_tile_y, first_tile_y + num_tiles_y):
+		row_vram_addr = 32 * (tile_y % 30)
 
-	return bg_region
+		if vertical_mirroring:
+			nametable_start = NAMETABLE_B_VRAM_START if (nametable_select ^ (tile_y >= 30)) else NAMETABLE_A_VRAM_START
+			vram_addr_left = nametable_start + (tile_x_left % 32)
+			vram_addr_right = nametable_start + (tile_x_right % 32)
 
+		column_left.append(chr_tiles_8x8[vram[vram_addr_left + row_vram_addr] + bg_pattern_table_offset])
+		column_right.append(chr_tiles_8x8[vram[vram_addr_right + row_vram_addr] + bg_pattern_table_offset])
 
-def _unraveled_argmax(arr: np.ndarray):
-	# Array is probably already in C-order, but explicitly ravel it to be sure
-	idx = np.argmax(arr.ravel(order='C'))
-	return np.unravel_index(idx, arr.shape)
+	return b''.join(column_left), b''.join(column_right)
 
 
 def _sprite_zero_hit_find_hit(
 		*,
 		ppumask: uint8,
-		sprite_tile: np.ndarray,
-		bg_region: np.ndarray,
+		sprite_tile: bytes,
+		bg_region_left: bytes,
+		bg_region_right: bytes,
 		sprite_x: int,
 		sprite_x_within_region: int,
 		sprite_y_within_region: int,
 		sprite_zero_debug_im: np.ndarray | None,
 		) -> tuple[int, int] | tuple[None, None]:
 
-	# Calculate background-sprite overlap
+	# Optimization: treat the sprite tile & background under it each as one big integer, 1 byte per row, so the whole
+	# overlap calculation is a handful of integer operations instead of array operations
+
+	height = len(sprite_tile)
+	ones = _PACKED_ROWS_ONES[height]
+	shift = sprite_x_within_region
 
-	sprite_tile_overlap = np.logical_and(
-		sprite_tile,
-		bg_region[
-			sprite_y_within_region : sprite_y_within_region + sprite_tile.shape[0],
-			sprite_x_within_region : sprite_x_within_region + 8]
+	bg_left = int.from_bytes(bg_region_left[sprite_y_within_region : sprite_y_within_region + height], 'big')
+	bg_right = int.from_bytes(bg_region_right[sprite_y_within_region : sprite_y_within_region + height], 'big')
+
+	# Align background with sprite: shift each row left by sprite_x_within_region, filling in from the right column
+	bg = (
+		((bg_left << shift) & (ones * ((0xFF << shift) & 0xFF))) |
+		((bg_right >> (8 - shift)) & (ones * (0xFF >> (8 - shift))))
 	)
 
+	# Calculate background-sprite overlap
+
+	sprite_tile_overlap = int.from_bytes(sprite_tile, 'big') & bg
+
 	# Handle PPUMASK option to hide left 8 pixels
 
 	if (ppumask & 0b0000_0110) != 0b0000_0110:
 		region_start_screen_x = sprite_x - sprite_x_within_region
-		ignore_columns = 8 - region_start_screen_x
-		if ignore_columns > 0:
-			sprite_tile_overlap[:, :ignore_columns] = False
-			if sprite_zero_debug_im is not None:
-				sprite_zero_debug_im[:, :ignore_columns, :] //= 2
+		sprite_tile_overlap &= _LEFT_8_PIXELS_HIDDEN_MASKS[height][region_start_screen_x + 7]
+		if sprite_zero_debug_im is not None and region_start_screen_x < 8:
+			sprite_zero_debug_im[:, :8 - region_start_screen_x, :] //= 2
 
-	# Find first non-False pixel (if any)
+	if not sprite_tile_overlap:
+		return None, None
 
-	y_within_sprite_tile, x_within_sprite_tile = _unraveled_argmax(sprite_tile_overlap)
+	# Find first set pixel: highest set bit is in first row with overlap, and is leftmost pixel within that row
 
-	assert 0 <= y_within_sprite_tile < sprite_tile.shape[0] and 0 <= x_within_sprite_tile < 8
-
-	if not sprite_tile_overlap[y_within_sprite_tile, x_within_sprite_tile]:
-		return None, None
+	bit_idx = sprite_tile_overlap.bit_length() - 1
+	y_within_sprite_tile = height - 1 - (bit_idx // 8)
+	x_within_sprite_tile = 7 - (bit_idx % 8)
 
 	return y_within_sprite_tile, x_within_sprite_tile
 
@@ -189,25 +255,38 @@ class Ppu:
 			rom_chr: bytes,
 			rom_header: INesHeader,
 			render_callback: RenderCallbackFn | None = None,
+			debug: bool = False,
 			):
+		"""
+		:param debug: if True, update debug status image & sprite_zero_debug_im (otherwise these are left blank)
+		"""
 
 		# TODO: make members private
 
 		self.rom_chr: Final[bytes] = rom_chr
+
+		# Optimization: CHR size is normally a power of 2, in which case reads can wrap with a mask instead of modulo
+		chr_len = len(rom_chr)
+		self._chr_addr_mask: Final[int | None] = (chr_len - 1) if (chr_len and not (chr_len & (chr_len - 1))) else None
 		self._render_callback: RenderCallbackFn | None = render_callback
 		self._last_row_rendered: int | None = None
 
-		# Optimization: arrange into (512, 8, 8) & (256, 16, 8) arrays now
-		self._chr_tiles_8x8_mask = chr_to_stacked(self.rom_chr, tall=False) > 0
-		self._chr_tiles_8x16_mask = chr_to_stacked(self.rom_chr, tall=True) > 0
+		# Optimization: pack tiles 1 byte per row (8x smaller than bool arrays), for sprite zero hit calculation
+		# These are packed straight from CHR bitplanes; 8x16 tiles are just rearranged pairs of 8x8 tiles
+		chr_rows_8x8 = _chr_to_packed_tile_rows(self.rom_chr)
+		chr_rows_8x16 = tiles_8x8_to_8x16(chr_rows_8x8)
 
 		# Optimization: pre-calculate which tiles are empty
-		self._empty_tiles_8x8 = [
-			(not self._chr_tiles_8x8_mask[idx].any()) for idx in range(self._chr_tiles_8x8_mask.shape[0])
-		]
-		self._empty_tiles_8x16 = [
-			(not self._chr_tiles_8x16_mask[idx].any()) for idx in range(self._chr_tiles_8x16_mask.shape[0])
-		]
+		# (As tuples of Python bools, because indexing a numpy array from Python is much slower)
+		self._empty_tiles_8x8: Final[tuple[bool, ...]] = tuple((~chr_rows_8x8.any(axis=1)).tolist())
+		self._empty_tiles_8x16: Final[tuple[bool, ...]] = tuple((~chr_rows_8x16.any(axis=1)).tolist())
+
+		self._chr_tile_rows_8x8: Final[tuple[bytes, ...]] = tuple(tile.tobytes() for tile in chr_rows_8x8)
+		self._chr_tile_rows_8x16: Final[tuple[bytes, ...]] = tuple(tile.tobytes() for tile in chr_rows_8x16)
+
+		# Optimization: pre-flip sprite tiles, so sprite zero hit calculation just has to look up the right one
+		self._chr_tile_rows_8x8_flipped: Final[tuple[tuple[bytes, ...], ...]] = _flip_tile_rows(self._chr_tile_rows_8x8)
+		self._chr_tile_rows_8x16_flipped: Final[tuple[tuple[bytes, ...], ...]] = _flip_tile_rows(self._chr_tile_rows_8x16)
 
 		self._vertical_mirroring = rom_header.vertical_mirroring
 
@@ -215,6 +294,13 @@ class Ppu:
 			NAMETABLE_LAYOUT_VERTICAL if self._vertical_mirroring else NAMETABLE_LAYOUT_HORIZONTAL
 		)
 
+		# Optimization: pre-calculate nametable VRAM address for every address in $2000-$2FFF (masked to $000-$FFF)
+		# A tuple is used rather than a numpy array, because indexing a tuple from Python is faster
+		# If mirroring ever becomes changeable (i.e. mappers), this will need to be rebuilt
+		self._nametable_vram_addr_lut: Final[tuple[int, ...]] = tuple(
+			(addr & 0x3FF) + self.nametable_layout[addr >> 10] for addr in range(0x1000)
+		)
+
 		self.vram: Final[bytearray] = bytearray(2048)
 		self.palette_ram: Final[bytearray] = bytearray(32)
 		self.oam: Final[bytearray] = bytearray(256)
@@ -225,7 +311,13 @@ class Ppu:
 
 		# Registers
 		self.ppuctrl: uint8 = 0  # $2000
+		# Optimization: PPUCTRL flags, decoded once on write instead of on every access
+		self._vblank_nmi_enable: bool = False
+		self._sprites_8x16: bool = False
+		self._ppuaddr_increment: int = 1
 		self.ppumask: uint8 = 0  # $2001
+		# Optimization: PPUMASK sprite or background rendering enabled, decoded once on write
+		self._rendering_enabled: bool = False
 		self.ppustatus: uint8 = 0  # $2002
 		self.oamaddr: uint8 = 0  # $2003
 		self.scroll_x: uint8 = 0  # $ 2005
@@ -238,24 +330,118 @@ class Ppu:
 		self.vblank: bool = False
 		self.nmi: bool = False
 
+		# Optimization: rendering enabled and not in VBLANK (i.e. writes can affect the current frame), updated whenever
+		# either changes instead of recalculating on every register write
+		self._rendering: bool = False
+
 		self.sprite_zero_hit_loc: tuple[int, int] = SPRITE_ZERO_HIT_NONE
-		self._waiting_for_sprite_zero_hit: bool = False
+		# Optimization: first row to check for sprite zero hit on, or _SPRITE_ZERO_CHECK_NEVER if not waiting for it
+		# (This combines "waiting for sprite zero hit" and hit row, so the check in the hot path is a single comparison)
+		self._sprite_zero_check_row: int = _SPRITE_ZERO_CHECK_NEVER
+		self._sprite_zero_hit_loc_dirty: bool = False
+
+		# Optimization: cache last sprite zero hit calculation, keyed on everything it depends on
+		# (nametable contents are tracked by a write counter rather than compared directly)
+		self._nametable_write_count: int = 0
+		self._sprite_zero_hit_cache_key: tuple | None = None
+		self._sprite_zero_hit_cache_loc: tuple[int, int] = SPRITE_ZERO_HIT_NONE
 
 		self.odd_frame: bool = False
 
 		self.vblank_start_callback: Callable[[], None] | None = None
 		self.vblank_end_callback: Callable[[], None] | None = None
 
-		self.debug_status_im = np.zeros((TOTAL_ROWS, 3), dtype=np.uint8)
+		# Optimization: dispatch register accesses through bound method tables rather than match/case
+		# Tables are indexed by address & 0x07; unsupported registers raise NotImplementedError
+		reg_read_handlers = {
+			0x2000: self._read_ppuctrl,
+			0x2001: self._read_ppumask,
+			0x2002: self._read_ppustatus,
+			0x2007: self._read_ppudata,
+		}
+		reg_write_handlers = {
+			0x2000: self._write_ppuctrl,
+			0x2001: self._write_ppumask,
+			0x2003: self._write_oamaddr,
+			0x2004: self._write_oamdata,
+			0x2005: self._write_ppuscroll,
+			0x2006: self._write_ppuaddr,
+			0x2007: self._write_ppudata,
+		}
+		self._reg_read_handlers: Final[tuple[Callable[[], uint8], ...]] = tuple(
+			reg_read_handlers.get(addr, partial(self._read_unsupported_reg, addr)) for addr in range(0x2000, 0x2008)
+		)
+		self._reg_write_handlers: Final[tuple[Callable[[uint8, bool], bool], ...]] = tuple(
+			reg_write_handlers.get(addr, partial(self._write_unsupported_reg, addr)) for addr in range(0x2000, 0x2008)
+		)
+
+		self._debug_enabled: bool = debug
+		# Optimization: only allocated once debug is enabled
+		self._debug_status_im: np.ndarray | None = np.zeros((TOTAL_ROWS, 3), dtype=np.uint8) if debug else None
+
+		# Optimization: debug status events are collected here, and only applied to the image in get_debug_status_im()
+		self._debug_reg_write_rows: list[int] = []
+		self._debug_sprite_zero_rows: list[int] = []
+		self._debug_sleep_spans: list[tuple[int, int]] = []
+
 		self.sprite_zero_debug_im = np.zeros((24, 16, 3), dtype=np.uint8)
 
+	def get_debug_status_im(self) -> np.ndarray:
+		"""
+		Apply pending debug status events, and return (TOTAL_ROWS, 3) debug image: register writes, sprite zero hit &
+		OAM DMA, and CPU sleep
+
+		Only valid while debug is enabled
+		"""
+		im = self._debug_status_im
+		assert self._debug_enabled and (im is not None)
+
+		if self._debug_reg_write_rows:
+			im[self._debug_reg_write_rows, 0] = 255
+			self._debug_reg_write_rows.clear()
+
+		if self._debug_sprite_zero_rows:
+			im[self._debug_sprite_zero_rows, 1] = 255
+			self._debug_sprite_zero_rows.clear()
+
+		for row_start, row_end in self._debug_sleep_spans:
+			if row_end == row_start:
+				# Slept an entire frame (except for a few columns) - this often happens right on startup
+				im[:, 2] = 255
+			elif row_end > row_start:
+				im[row_start:row_end, 2] = 255
+			else:
+				im[row_start:, 2] = 255
+				im[:row_end, 2] = 255
+		self._debug_sleep_spans.clear()
+
+		return im
+
+	@property
+	def debug_enabled(self) -> bool:
+		return self._debug_enabled
+
+	@debug_enabled.setter
+	def debug_enabled(self, value: bool) -> None:
+		"""
+		Enable or disable updating debug status image & sprite_zero_debug_im (e.g. only while debug view is shown)
+		"""
+		self._debug_enabled = value
+		if value:
+			if self._debug_status_im is None:
+				self._debug_status_im = np.zeros((TOTAL_ROWS, 3), dtype=np.uint8)
+		else:
+			self._debug_reg_write_rows.clear()
+			self._debug_sprite_zero_rows.clear()
+			self._debug_sleep_spans.clear()
+
 	@property
 	def vblank_nmi_enable(self) -> bool:
-		return bool(self.ppuctrl & 0b1000_0000)
+		return self._vblank_nmi_enable
 
 	@property
 	def sprites_8x16(self) -> bool:
-		return bool(self.ppuctrl & 0b0010_0000)
+		return self._sprites_8x16
 
 	@property
 	def sprite_zero_hit(self) -> bool:
@@ -267,7 +453,14 @@ class Ppu:
 
 	@property
 	def ppuaddr_increment(self) -> int:
-		return 32 if (self.ppuctrl & 0b0000_0100) else 1
+		return self._ppuaddr_increment
+
+	@property
+	def nametable_write_count(self) -> int:
+		"""
+		Incremented on every nametable write; can be used to check if nametables have changed
+		"""
+		return self._nametable_write_count
 
 	def tick_clock_fom_cpu(self, cpu_cycles: int) -> None:
 		ppu_cycles = 3 * cpu_cycles
@@ -308,28 +501,74 @@ class Ppu:
 		Indicate that rendering a frame is complete
 		(i.e. reset debug status image)
 		"""
-		self.debug_status_im[:VBLANK_START_ROW, ...].fill(31)
-		self.debug_status_im[VBLANK_START_ROW:, ...].fill(127)
+		if not self._debug_enabled:
+			return
+		self._debug_reg_write_rows.clear()
+		self._debug_sprite_zero_rows.clear()
+		self._debug_sleep_spans.clear()
+		self._debug_status_im[:VBLANK_START_ROW, ...].fill(31)
+		self._debug_status_im[VBLANK_START_ROW:, ...].fill(127)
 
 	def _tick_clock(self, cycles: int) -> None:
-		# TODO: this is in a hot path, optimize it better (can finish multiple rows at once)
-		self.col += cycles
 
-		if self._waiting_for_sprite_zero_hit:
-			self._check_sprite_zero_hit()
+		col = self.col + cycles
 
-		while self.col >= COLUMNS:
-			self.col -= COLUMNS
-			self._finish_row()
+		if col < COLUMNS:
+			# Optimization: most common case, still on the same row
+			self.col = col
+			# Optimization: check hit row inline, to skip the function call on every tick before the hit row
+			if self.row >= self._sprite_zero_check_row:
+				self._check_sprite_zero_hit()
+			return
+
+		row = self.row
+		num_rows, col = divmod(col, COLUMNS)
+		row_end = row + num_rows
+
+		if row_end <= VBLANK_START_ROW or (VBLANK_START_ROW < row and row_end <= VBLANK_END_ROW):
+			# Optimization: not finishing any rows where something happens in _finish_row() (start or end of VBLANK,
+			# or end of frame), so we can skip straight to the end
+			self.row = row_end
+			self.col = col
+
+		else:
+			# Optimization: bind method locally, since this can run for many rows (e.g. OAM DMA)
+			finish_row = self._finish_row
+			self.col = col
+			for _ in range(num_rows):
+				finish_row()
+			# _finish_row() adds a column at the end of an odd frame, which can roll over into another row
+			if self.col >= COLUMNS:
+				self.col -= COLUMNS
+				finish_row()
+
+		# Sprite zero is checked once, after all rows are finished (i.e. against final row & col), rather than before
+		# rolling over rows. A hit on a row we skipped past is still caught, since row > sprite zero row
+		if self.row >= self._sprite_zero_check_row:
+			self._check_sprite_zero_hit()
 
 	def _check_sprite_zero_hit(self) -> None:
 		row = self.row
+
+		if row >= VBLANK_END_ROW:
+			# Pre-render rows - hit location is already for the next frame
+			return
+
+		if self._sprite_zero_hit_loc_dirty:
+			# Optimization: sprite zero can't be hit above its top row, so don't recalculate until we get there
+			if row <= self.oam[0]:
+				return
+			self._update_sprite_zero_hit_loc()
+			if self._sprite_zero_check_row == _SPRITE_ZERO_CHECK_NEVER:
+				return
+
 		sprite_zero_row, sprite_zero_col = self.sprite_zero_hit_loc
 		if (row > sprite_zero_row) or (row == sprite_zero_row and self.col >= sprite_zero_col):
 			logger.debug(f'Sprite zero hit on row {row}')
-			self._waiting_for_sprite_zero_hit = False
+			self._sprite_zero_check_row = _SPRITE_ZERO_CHECK_NEVER
 			self.ppustatus |= 0b0100_0000
-			self.debug_status_im[row, 1] = 255
+			if self._debug_enabled:
+				self._debug_sprite_zero_rows.append(sprite_zero_row)
 
 	def _finish_row(self) -> None:
 
@@ -339,7 +578,7 @@ class Ppu:
 		assert row_num < TOTAL_ROWS
 
 		if row_num == VBLANK_START_ROW:
-			if self._waiting_for_sprite_zero_hit:
+			if row_num >= self._sprite_zero_check_row:
 				self._check_sprite_zero_hit()
 
 			# TODO accuracy: technically this occurs 1 PPU clock later
@@ -350,20 +589,45 @@ class Ppu:
 				# TODO accuracy: technically this occurs 1 PPU clock later
 				self._vblank_end()
 
-			if self._waiting_for_sprite_zero_hit:
+			if row_num >= self._sprite_zero_check_row:
 				self._check_sprite_zero_hit()
 
-		self.row = row_num = (row_num + 1) % TOTAL_ROWS
-
-		if row_num == 0:
+		# Optimization: conditional wrap rather than modulo
+		row_num += 1
+		if row_num < TOTAL_ROWS:
+			self.row = row_num
+		else:
+			self.row = 0
 			self.frame_count += 1
 			if self.odd_frame:
 				self.col += 1
 			self.odd_frame = not self.odd_frame
 
+	def _invalidate_sprite_zero_hit_loc(self) -> None:
+		"""
+		Mark sprite zero hit location as needing to be recalculated, without calculating it yet
+		"""
+		# Optimization: several writes can happen before the hit location actually matters, so only calculate once
+		self._sprite_zero_hit_loc_dirty = True
+		# Sprite zero can't be hit above its top row, so use that as a placeholder until it's actually calculated
+		self.sprite_zero_hit_loc = (self.oam[0] + 1, 0)
+		self._sprite_zero_check_row = _SPRITE_ZERO_CHECK_NEVER if self.sprite_zero_hit else self.sprite_zero_hit_loc[0]
+
 	def _update_sprite_zero_hit_loc(self) -> None:
-		self.sprite_zero_hit_loc = self._calculate_sprite_zero_hit()
-		self._waiting_for_sprite_zero_hit = (not self.sprite_zero_hit) and (self.sprite_zero_hit_loc[0] < VBLANK_START_ROW)
+		self._sprite_zero_hit_loc_dirty = False
+
+		# Optimization: most of the time, nothing relevant has changed since the last calculation (e.g. at the end of
+		# VBLANK with a static screen), so reuse the previous result
+		key = (bytes(self.oam[:4]), self.ppuctrl, self.ppumask, self.scroll_x, self.scroll_y, self._nametable_write_count)
+		if key != self._sprite_zero_hit_cache_key:
+			self._sprite_zero_hit_cache_key = key
+			self._sprite_zero_hit_cache_loc = self._calculate_sprite_zero_hit()
+
+		self.sprite_zero_hit_loc = self._sprite_zero_hit_cache_loc
+		if (not self.sprite_zero_hit) and (self.sprite_zero_hit_loc[0] < VBLANK_START_ROW):
+			self._sprite_zero_check_row = self.sprite_zero_hit_loc[0]
+		else:
+			self._sprite_zero_check_row = _SPRITE_ZERO_CHECK_NEVER
 
 	def _calculate_sprite_zero_hit(self) -> tuple[int, int]:
 		"""
@@ -371,7 +635,10 @@ class Ppu:
 		:returns: (y, x); if sprite zero never gets hit, then returns out of bounds coordinate (SPRITE_ZERO_HIT_NONE)
 		"""
 
-		self.sprite_zero_debug_im.fill(0)
+		debug = self._debug_enabled
+
+		if debug:
+			self.sprite_zero_debug_im.fill(0)
 
 		# If sprite or BG rendering is disabled, we do not hit
 		if (self.ppumask & 0b0001_1000) != 0b0001_1000:
@@ -382,8 +649,8 @@ class Ppu:
 		sprite_tile, sprite_x, sprite_y = _sprite_zero_hit_load_sprite(
 			ppuctrl=self.ppuctrl,
 			oam=self.oam,
-			chr_tiles_8x8=self._chr_tiles_8x8_mask,
-			chr_tiles_8x16=self._chr_tiles_8x16_mask,
+			chr_tiles_8x8=self._chr_tile_rows_8x8_flipped,
+			chr_tiles_8x16=self._chr_tile_rows_8x16_flipped,
 			empty_tiles_8x8=self._empty_tiles_8x8,
 			empty_tiles_8x16=self._empty_tiles_8x16,
 		)
@@ -395,20 +662,22 @@ class Ppu:
 		bg_first_tile_x = (self.scroll_x + sprite_x) // 8
 		bg_first_tile_y = (self.scroll_y + sprite_y) // 8
 
-		bg_region = _sprite_zero_hit_render_background_region(
+		bg_region_left, bg_region_right = _sprite_zero_hit_render_background_region(
 			ppuctrl=self.ppuctrl,
 			vram=self.vram,
 			vertical_mirroring=self._vertical_mirroring,
-			chr_tiles_8x8=self._chr_tiles_8x8_mask,
+			chr_tiles_8x8=self._chr_tile_rows_8x8,
 			first_tile_x=bg_first_tile_x,
 			first_tile_y=bg_first_tile_y,
 		)
 
-		if not bg_region.any():
+		if not (any(bg_region_left) or any(bg_region_right)):
 			logging.debug('Sprite zero hit: background region is empty, no hit')
 			return SPRITE_ZERO_HIT_NONE
 
-		self.sprite_zero_debug_im[:bg_region.shape[0], :, 2] = np.where(bg_region, 255, 0)
+		if debug:
+			bg_region = np.hstack((_unpack_tile_rows(bg_region_left), _unpack_tile_rows(bg_region_right)))
+			self.sprite_zero_debug_im[:bg_region.shape[0], :, 2] = np.multiply(bg_region, 255, dtype=np.uint8)
 
 		# Align sprite relative to BG tiles
 
@@ -417,32 +686,35 @@ class Ppu:
 		assert 0 <= sprite_x_within_region < 8
 		assert 0 <= sprite_y_within_region < 8
 
-		self.sprite_zero_debug_im[
-			sprite_y_within_region : sprite_y_within_region + sprite_tile.shape[0],
-			sprite_x_within_region : sprite_x_within_region + 8,
-			0] = np.where(sprite_tile, 255, 0)
+		if debug:
+			self.sprite_zero_debug_im[
+				sprite_y_within_region : sprite_y_within_region + len(sprite_tile),
+				sprite_x_within_region : sprite_x_within_region + 8,
+				0] = np.multiply(_unpack_tile_rows(sprite_tile), 255, dtype=np.uint8)
 
 		# Find hit
 
 		y_within_sprite_tile, x_within_sprite_tile = _sprite_zero_hit_find_hit(
 			ppumask=self.ppumask,
 			sprite_tile=sprite_tile,
-			bg_region=bg_region,
+			bg_region_left=bg_region_left,
+			bg_region_right=bg_region_right,
 			sprite_x=sprite_x,
 			sprite_x_within_region=sprite_x_within_region,
 			sprite_y_within_region=sprite_y_within_region,
-			sprite_zero_debug_im=self.sprite_zero_debug_im
+			sprite_zero_debug_im=(self.sprite_zero_debug_im if debug else None),
 		)
 
 		if y_within_sprite_tile is None:
 			logging.debug(f'Sprite zero hit: sprite at ({sprite_x}, {sprite_y}) does not hit')
 			return SPRITE_ZERO_HIT_NONE
 
-		# Set this pixel to green
-		self.sprite_zero_debug_im[
-			sprite_y_within_region + y_within_sprite_tile,
-			sprite_x_within_region + x_within_sprite_tile,
-			...] = (0, 255, 0)
+		if debug:
+			# Set this pixel to green
+			self.sprite_zero_debug_im[
+				sprite_y_within_region + y_within_sprite_tile,
+				sprite_x_within_region + x_within_sprite_tile,
+				...] = (0, 255, 0)
 
 		# Adjust coordinates to be relative to screen, and check bounds
 
@@ -478,13 +750,6 @@ class Ppu:
 		vblank_was = self.vblank
 		row_start = self.row
 
-		if self._waiting_for_sprite_zero_hit:
-			# Tick ahead to sprite zero hit
-			...  # TODO
-		else:
-			# Tick ahead to VBLANK
-			...  # TODO
-
 		# Tick ahead to end of this line
 		# This also prevents self._col from overflowing on an odd frame
 		columns_remaining = COLUMNS - self.col
@@ -493,10 +758,19 @@ class Ppu:
 		assert self.col <= 1  # Usually 0, but can be 1 on row 0 due to odd frame behavior
 		assert self.row != row_start
 
-		# TODO optimization: Calculate when the next PPUSTATUS change will happen and tick straight there instead of
-		# 1 row at a time
-
 		while self.vblank == vblank_was and self.ppustatus == ppustatus_was:
+
+			# Optimization: skip straight to the next row where something could happen (sprite zero hit row, or start
+			# or end of VBLANK) instead of finishing every row in between
+			# (Nothing happens in _finish_row() for the rows skipped, other than sprite zero checks that can't hit yet)
+			row = self.row
+			if row < VBLANK_START_ROW:
+				next_row = min(VBLANK_START_ROW, self._sprite_zero_check_row)
+				if next_row > row:
+					self.row = next_row
+			elif VBLANK_START_ROW < row < VBLANK_END_ROW:
+				self.row = VBLANK_END_ROW
+
 			# Tick ahead 1 row
 			# Optimization: skip going through self._tick_clock(COLUMNS) or incrementing self._col
 			self._finish_row()
@@ -504,23 +778,16 @@ class Ppu:
 			# due to _tick_clock(columns_remaining) above
 			assert self.col <= 1
 
-		row_end = self.row
-
-		if row_end == row_start:
-			# Slept an entire frame (except for a few columns) - this often happens right on startup
-			self.debug_status_im[:, 2] = 255
-		elif row_end > row_start:
-			self.debug_status_im[row_start:row_end, 2] = 255
-		else:
-			self.debug_status_im[row_start:, 2] = 255
-			self.debug_status_im[:row_end, 2] = 255
+		if self._debug_enabled:
+			self._debug_sleep_spans.append((row_start, self.row))
 
 	def _vblank_start(self):
 		# Set vblank
-		self._waiting_for_sprite_zero_hit = False
+		self._sprite_zero_check_row = _SPRITE_ZERO_CHECK_NEVER
 		self.ppustatus |= 0b1000_0000
 		self.vblank = True
-		if self.vblank_nmi_enable:
+		self._rendering = False
+		if self._vblank_nmi_enable:
 			logger.debug(f'Frame {self.frame_count} VBLANK start (NMI enabled)')
 			self.nmi = True
 		else:
@@ -537,6 +804,7 @@ class Ppu:
 		logger.debug('VBLANK end')
 		self.ppustatus = 0
 		self.vblank = False
+		self._rendering = self._rendering_enabled
 		self.nmi = False
 
 		if self.vblank_end_callback:
@@ -548,29 +816,29 @@ class Ppu:
 		"""
 		Read register in the range 0x2000-0x2007
 		"""
+		return self._reg_read_handlers[addr & 0x07]()
+
+	def _read_unsupported_reg(self, addr: pointer16) -> uint8:
+		raise NotImplementedError(f'TODO: support reading PPU register ${addr:04X}')
+
+	def _read_ppuctrl(self) -> uint8:
+		return self.ppuctrl
 
-		match addr:
-			case 0x2000:
-				# PPUCTRL
-				return self.ppuctrl
-			case 0x2001:
-				# PPUMASK
-				return self.ppumask
-			case 0x2002:
-				# PPUSTATUS
-				ret = self.ppustatus
-				# Reading PPUSTATUS clears vblank bit
-				self.ppustatus &= 0b0111_1111
-				self.write_latch = False
-				return ret
-			case 0x2007:
-				# PPUDATA
-				ret = self.ppudata_read_buffer
-				self.ppudata_read_buffer = self.read(self.ppuaddr)
-				self.ppuaddr += self.ppuaddr_increment
-				return ret
-			case _:
-				raise NotImplementedError(f'TODO: support reading PPU register ${addr:04X}')
+	def _read_ppumask(self) -> uint8:
+		return self.ppumask
+
+	def _read_ppustatus(self) -> uint8:
+		ret = self.ppustatus
+		# Reading PPUSTATUS clears vblank bit
+		self.ppustatus &= 0b0111_1111
+		self.write_latch = False
+		return ret
+
+	def _read_ppudata(self) -> uint8:
+		ret = self.ppudata_read_buffer
+		self.ppudata_read_buffer = self.read(self.ppuaddr)
+		self.ppuaddr += self._ppuaddr_increment
+		return ret
 
 	def write_reg_from_cpu(self, addr: pointer16, value: uint8) -> None:
 		"""
@@ -583,101 +851,113 @@ class Ppu:
 		# render has to happen before we make the write; sprite zero update has to happen after
 		# (In most cases, this change was triggered by sprite zero hit in the first place, so that means it's already
 		# happened and doesn't need to be updated - we have a check for that later)
-		rendering = (not self.vblank) and (self.ppumask & 0b0001_1000)
-		sprite_zero_affected = False
+		rendering = self._rendering
 
 		# FIXME: PPUSCROLL & PPUADDR share an internal register (as well as 2 bits of PPUCTRL)
 		# https://www.nesdev.org/wiki/PPU_scrolling
 		# It also sounds like vertical scroll gets delayed until next frame, except with hacks via 0x2006
 
-		match addr:
-			case 0x2000:
-				# PPUCTRL
-				# Can be modified while rendering
-				logger.debug(f'Setting PPUCTRL=0x{value:02X}')
-
-				# Check if any bits were changed, ignoring NMI or VRAM address increment bits
-				if rendering and ((self.ppuctrl ^ value) & 0b0111_1011):
-					logger.debug(f'Updating PPUCTRL mid-frame {self.frame_count}:{self.row}: {self.ppuctrl:08b} -> {value:08b}')
-					self._signal_render()
-					sprite_zero_affected = True
-
-				self.ppuctrl = value
-
-			case 0x2001:
-				# PPUMASK
-				# Can be modified while rendering
-				logger.debug(f'Setting PPUMASK=0x{value:02X}')
-				if rendering and self.ppumask != value:
-					logger.debug(f'Updating PPUMASK mid-frame {self.frame_count}:{self.row}: {self.ppumask:08b} -> {value:08b}')
-					self._signal_render()
-					sprite_zero_affected = True
-				self.ppumask = value
-
-			case 0x2003:
-				# OAMADDR
-				# Should not be modified while rendering
-				if rendering:
-					raise NotImplementedError('Behavior of writing OAMADDR while rendering is not implemented')
-				self.oamaddr = value
-
-			case 0x2004:
-				# OAMDATA
-				# Should not be modified while rendering
-				raise NotImplementedError('Manually writing OAMDATA is not yet supported')
-
-			case 0x2005:
-				# PPUSCROLL
-				# Can be modified while rendering
-
-				if rendering:
-					logger.debug(f'Updating PPUSCROLL mid-frame {self.frame_count}:{self.row}')
-					self._signal_render()
-					sprite_zero_affected = True
-
-				if not self.write_latch:
-					# 1st write: X
-					logger.debug(f'Setting PPUSCROLL X={value}')
-					self.scroll_x = value
-				else:
-					# 2nd write: Y
-					# TODO: if rendering, do not apply until write to 2006
-					logger.debug(f'Setting PPUSCROLL Y={value}')
-					self.scroll_y = value
-				self.write_latch = not self.write_latch
-
-			case 0x2006:
-				# PPUADDR
-				# TODO: behavior while rendering
-				if not self.write_latch:
-					# 1st write: MSB
-					self.ppuaddr = ((value & 0x3F) << 8) | (self.ppuaddr & 0x00FF)
-				else:
-					# 2nd write: LSB
-					self.ppuaddr = (self.ppuaddr & 0xFF00) | value
-					logger.debug(f'Set PPUADDR=${self.ppuaddr:04X}')
-				self.write_latch = not self.write_latch
-
-			case 0x2007:
-				# PPUDATA
-				# Should not be modified while rendering
-				if rendering:
-					raise NotImplementedError('Behavior of writing PPUDATA while rendering is not implemented')
-				self.write(self.ppuaddr, value)
-				self.ppuaddr += self.ppuaddr_increment
-
-			case _:
-				raise NotImplementedError(f'TODO: support writing PPU register ${addr:04X}')
-
-		self.debug_status_im[self.row, 0] = 255
-
-		# If updating mid-frame and we haven't hit sprite zero yet, update sprite zero hit location
+		sprite_zero_affected = self._reg_write_handlers[addr & 0x07](value, rendering)
+
+		if self._debug_enabled:
+			self._debug_reg_write_rows.append(self.row)
+
+		# If updating mid-frame and we haven't hit sprite zero yet, sprite zero hit location needs to be updated
 		if rendering and sprite_zero_affected and not self.sprite_zero_hit:
-			self._update_sprite_zero_hit_loc()
+			self._invalidate_sprite_zero_hit_loc()
+
+	# Register write handlers: return True if the write could affect sprite zero hit location
+
+	def _write_unsupported_reg(self, addr: pointer16, value: uint8, rendering: bool) -> bool:
+		raise NotImplementedError(f'TODO: support writing PPU register ${addr:04X}')
+
+	def _write_ppuctrl(self, value: uint8, rendering: bool) -> bool:
+		# Can be modified while rendering
+		logger.debug(f'Setting PPUCTRL=0x{value:02X}')
+
+		# Check if any bits were changed, ignoring NMI or VRAM address increment bits
+		sprite_zero_affected = False
+		if rendering and ((self.ppuctrl ^ value) & 0b0111_1011):
+			logger.debug(f'Updating PPUCTRL mid-frame {self.frame_count}:{self.row}: {self.ppuctrl:08b} -> {value:08b}')
+			self._signal_render()
+			sprite_zero_affected = True
+
+		self.ppuctrl = value
+		self._vblank_nmi_enable = bool(value & 0b1000_0000)
+		self._sprites_8x16 = bool(value & 0b0010_0000)
+		self._ppuaddr_increment = 32 if (value & 0b0000_0100) else 1
+		return sprite_zero_affected
+
+	def _write_ppumask(self, value: uint8, rendering: bool) -> bool:
+		# Can be modified while rendering
+		logger.debug(f'Setting PPUMASK=0x{value:02X}')
+		sprite_zero_affected = False
+		if rendering and self.ppumask != value:
+			logger.debug(f'Updating PPUMASK mid-frame {self.frame_count}:{self.row}: {self.ppumask:08b} -> {value:08b}')
+			self._signal_render()
+			# Only the sprite/background enable & left 8 pixel bits affect sprite zero hit, not greyscale or emphasis
+			sprite_zero_affected = bool((self.ppumask ^ value) & 0b0001_1110)
+		self.ppumask = value
+		self._rendering_enabled = bool(value & 0b0001_1000)
+		self._rendering = self._rendering_enabled and not self.vblank
+		return sprite_zero_affected
+
+	def _write_oamaddr(self, value: uint8, rendering: bool) -> bool:
+		# Should not be modified while rendering
+		if rendering:
+			raise NotImplementedError('Behavior of writing OAMADDR while rendering is not implemented')
+		self.oamaddr = value
+		return False
+
+	def _write_oamdata(self, value: uint8, rendering: bool) -> bool:
+		# Should not be modified while rendering
+		raise NotImplementedError('Manually writing OAMDATA is not yet supported')
+
+	def _write_ppuscroll(self, value: uint8, rendering: bool) -> bool:
+		# Can be modified while rendering
+
+		if rendering:
+			logger.debug(f'Updating PPUSCROLL mid-frame {self.frame_count}:{self.row}')
+			self._signal_render()
+
+		if not self.write_latch:
+			# 1st write: X
+			logger.debug(f'Setting PPUSCROLL X={value}')
+			changed = value != self.scroll_x
+			self.scroll_x = value
+		else:
+			# 2nd write: Y
+			# TODO: if rendering, do not apply until write to 2006
+			logger.debug(f'Setting PPUSCROLL Y={value}')
+			changed = value != self.scroll_y
+			self.scroll_y = value
+		self.write_latch = not self.write_latch
+
+		# Many games rewrite the same scroll values; no need to update sprite zero hit location for those
+		return bool(rendering) and changed
+
+	def _write_ppuaddr(self, value: uint8, rendering: bool) -> bool:
+		# TODO: behavior while rendering
+		if not self.write_latch:
+			# 1st write: MSB
+			self.ppuaddr = ((value & 0x3F) << 8) | (self.ppuaddr & 0x00FF)
+		else:
+			# 2nd write: LSB
+			self.ppuaddr = (self.ppuaddr & 0xFF00) | value
+			logger.debug(f'Set PPUADDR=${self.ppuaddr:04X}')
+		self.write_latch = not self.write_latch
+		return False
+
+	def _write_ppudata(self, value: uint8, rendering: bool) -> bool:
+		# Should not be modified while rendering
+		if rendering:
+			raise NotImplementedError('Behavior of writing PPUDATA while rendering is not implemented')
+		self.write(self.ppuaddr, value)
+		self.ppuaddr += self._ppuaddr_increment
+		return False
 
 	def nametable_vram_addr(self, addr: pointer16) -> int:
-		nametable_idx, addr_low = divmod(addr & 0x0FFF, 0x400)
-		return addr_low + self.nametable_layout[nametable_idx]
+		return self._nametable_vram_addr_lut[addr & 0x0FFF]
 
 	def write(self, addr: pointer16, value: uint8) -> None:
 
@@ -687,7 +967,9 @@ class Ppu:
 
 		elif addr < 0x3000:
 			# Nametable
-			self.vram[self.nametable_vram_addr(addr)] = value
+			# Optimization: use LUT directly instead of calling self.nametable_vram_addr()
+			self.vram[self._nametable_vram_addr_lut[addr & 0x0FFF]] = value
+			self._nametable_write_count += 1
 
 		elif addr < 0x3F00:
 			# Unused
@@ -695,12 +977,9 @@ class Ppu:
 
 		elif addr < 0x4000:
 			# Palette RAM
-			idx = addr % 0x20
-			if idx >= 0x10 and idx % 4 == 0:
-				# Palette entry 0 is shared between sprite & BG
-				# This neeeded for Super Mario Bros to work properly
-				idx -= 0x10
-			self.palette_ram[idx] = value
+			# Palette entry 0 is shared between sprite & BG (see _PALETTE_RAM_INDEX_LUT)
+			# This neeeded for Super Mario Bros to work properly
+			self.palette_ram[_PALETTE_RAM_INDEX_LUT[addr & 0x1F]] = value
 
 		else:
 			raise AssertionError(f'Invalid PPU address: ${addr:04X}')
@@ -708,11 +987,14 @@ class Ppu:
 	def read(self, addr: pointer16) -> uint8:
 		if addr < 0x2000:
 			# CHR
+			if self._chr_addr_mask is not None:
+				return self.rom_chr[addr & self._chr_addr_mask]
 			return self.rom_chr[addr % len(self.rom_chr)]
 
 		elif addr < 0x3000:
 			# Nametable
-			return self.vram[self.nametable_vram_addr(addr)]
+			# Optimization: use LUT directly instead of calling self.nametable_vram_addr()
+			return self.vram[self._nametable_vram_addr_lut[addr & 0x0FFF]]
 
 		elif addr < 0x3F00:
 			# Unused
@@ -724,17 +1006,26 @@ class Ppu:
 
 		raise AssertionError(f'Invalid PPU address: ${addr:04X}')
 
-	def oam_dma(self, data: bytes) -> None:
+	def oam_dma(self, data: bytes | bytearray | memoryview) -> None:
 		"""
 		Start an OAM DMA
+
+		:param data: 256 bytes; may be a view into CPU RAM, as it is only read during this call
 		"""
 		# TODO: do this step by step instead of all at once, like a real NES
-		# TODO: not sure of behavior if called outside of VBLANK
-		# If it's allowed, update self.sprite_zero_hit_loc
 		assert len(data) == len(self.oam)
-		self.oam[:] = data
 
-		row_start = self.row
-		row_end = row_start + ceil(513 * 3 / COLUMNS)
+		# Optimization: most games DMA the same data every frame while nothing is moving; comparing is much cheaper
+		# than copying & invalidating sprite zero hit location
+		if data != self.oam:
+			self.oam[:] = data
+
+			# TODO: not sure of behavior if called outside of VBLANK
+			# If it's allowed, sprite zero hit location needs to be updated
+			if self._rendering and not self.sprite_zero_hit:
+				self._invalidate_sprite_zero_hit_loc()
 
-		self.debug_status_im[row_start:row_end, 1] = 255
+		if self._debug_enabled:
+			row_start = self.row
+			row_end = min(row_start + OAM_DMA_ROW_COUNT, TOTAL_ROWS)
+			self._debug_sprite_zero_rows.extend(range(row_start, row_end))
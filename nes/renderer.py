@@ -5,15 +5,18 @@ from typing import Final
 
 import numpy as np
 
-from nes.ppu import Ppu
+from nes.ppu import Ppu, TOTAL_ROWS
 from nes.rom import INesHeader
-from nes.graphics_utils import chr_to_array, chr_to_stacked, grey_to_rgb, load_palette_file, draw_rectangle
+from nes.graphics_utils import chr_to_array, chr_to_stacked, tiles_8x8_to_8x16, grey_to_rgb, load_palette_file, draw_rectangle
 from nes.types import uint8, pointer16
 
 # From https://www.nesdev.org/wiki/File:2C02G_wiki.pal
 NES_PALETTES: Final[np.ndarray] = load_palette_file(Path(__file__).parent / '2C02G_wiki.pal')
 NES_PALETTE_MAIN: Final[np.ndarray] = NES_PALETTES[0]
 
+# NES_PALETTE_MAIN extended to every uint8 value, where indexes >= 64 (i.e. transparent) map to color 0
+_NES_PALETTE_MAIN_CLAMPED: Final[np.ndarray] = NES_PALETTE_MAIN[np.where(np.arange(256) < 64, np.arange(256), 0)]
+
 LUT_2BIT_TO_8BIT: Final[np.ndarray] = np.array([0, 256//3, 512//3, 255], dtype=np.uint8)
 
 
@@ -28,23 +31,71 @@ def _save_chr(chr_array_rgb: np.ndarray, scale=2, filename='chr.png'):
 	im.save(filename)
 
 
-def _mirror(a: np.ndarray, b: np.ndarray, ppuctrl: uint8, vertical: bool) -> np.ndarray:
+def _flip_tiles(tiles: np.ndarray) -> np.ndarray:
+	"""
+	Pre-calculate every flipped version of tiles
+
+	:param tiles: shape (N, H, 8)
+	:returns: shape (N, 4, H, 8), where 2nd index is sprite flags >> 6 (i.e. bit 1 = vertical flip, bit 0 = horizontal flip)
+	"""
+	flipped_h = tiles[:, :, ::-1]
+	return np.stack((tiles, flipped_h, tiles[:, ::-1, :], flipped_h[:, ::-1, :]), axis=1)
+
+
+def _draw_sprite_outlines(mask: np.ndarray, x: np.ndarray, y: np.ndarray, h: int) -> None:
+	"""
+	Equivalent to draw_rectangle(mask, True, x, y, 8, h) for each sprite, but all at once
+	"""
+	x = x[:, None]
+	y = y[:, None]
+	cols = x + np.arange(7)
+	rows = y + np.arange(h - 1)
+	mask[y, cols] = True
+	mask[y + (h - 1), cols] = True
+	mask[rows, x] = True
+	mask[rows, x + 7] = True
+
+
+def _mirror(
+		a: np.ndarray,
+		b: np.ndarray,
+		ppuctrl: uint8,
+		vertical: bool,
+		*,
+		out: np.ndarray | None = None,
+		) -> np.ndarray:
 	"""
 	Take nametables A & B and copy them to 2x2 layout, according to mirroring mode and PPUCTRL base nametable bits
 	"""
 
+	if out is None:
+		out = np.empty((480, 512), dtype=a.dtype)
+
 	if vertical:
 		# TODO: is this right? test it
-		order = [b, a] if ppuctrl & 0b0000_0001 else [a, b]
-		row = np.hstack(order)
-		return np.vstack([row, row])
+		left, right = (b, a) if ppuctrl & 0b0000_0001 else (a, b)
+		top_left = bottom_left = left
+		top_right = bottom_right = right
 	else:
-		order = [b, a] if ppuctrl & 0b0000_0010 else [a, b]
-		col = np.vstack(order)
-		return np.hstack([col, col])
+		top, bottom = (b, a) if ppuctrl & 0b0000_0010 else (a, b)
+		top_left = top_right = top
+		bottom_left = bottom_right = bottom
 
+	np.copyto(out[:240, :256], top_left)
+	np.copyto(out[:240, 256:], top_right)
+	np.copyto(out[240:, :256], bottom_left)
+	np.copyto(out[240:, 256:], bottom_right)
 
-def _apply_unapply_nametable_select(im: np.ndarray, ppuctrl: uint8, vertical_mirroring: bool) -> np.ndarray:
+	return out
+
+
+def _apply_unapply_nametable_select(
+		im: np.ndarray,
+		ppuctrl: uint8,
+		vertical_mirroring: bool,
+		*,
+		out: np.ndarray | None = None,
+		) -> np.ndarray:
 	"""
 	Nametables are assembled the way the PPU reads them (scroll cannot wrap around, but equivalent behavior can be
 	achieved using PPUCTRL base nametable bits to swap the nametable order). This function takes an assembled order, and
@@ -52,137 +103,111 @@ def _apply_unapply_nametable_select(im: np.ndarray, ppuctrl: uint8, vertical_mir
 	intuitive order for displaying.
 
 	It also works in the other direction
+
+	:param out: if given, result is always written here (must not overlap im); otherwise im may be returned as-is
 	"""
 
 	if vertical_mirroring:
 		# TODO: as in _mirror, test this
 		if ppuctrl & 0b0000_0001:
 			# Swap left & right
-			a = im[:, :256, ...]
-			b = im[:, 256:, ...]
-			return np.hstack((b, a))
+			if out is None:
+				out = np.empty_like(im)
+			np.copyto(out[:, :256, ...], im[:, 256:, ...])
+			np.copyto(out[:, 256:, ...], im[:, :256, ...])
+			return out
 	else:
 		if ppuctrl & 0b0000_0010:
 			# Swap top & bottom
-			a = im[:240, ...]
-			b = im[240:, ...]
-			return np.vstack((b, a))
-
-	return im
-
-
-def _populate_nametable_tiles(
-		*,
-		nametable_a: bytes | bytearray,
-		nametable_b: bytes | bytearray,
-		chr_tiles_8x8: np.ndarray,
-		ppuctrl: uint8,
-		nametable_a_out: np.ndarray | None = None,
-		nametable_b_out: np.ndarray | None = None,
-		) -> tuple[np.ndarray, np.ndarray]:
+			if out is None:
+				out = np.empty_like(im)
+			np.copyto(out[:240, ...], im[240:, ...])
+			np.copyto(out[240:, ...], im[:240, ...])
+			return out
 
-	# As an optimization, we have 1 function that populates both nametables
-	# TODO: If this can be numpy-optimized, then change it to only populate 1 nametable at a time
-
-	if nametable_a_out is None:
-		nametable_a_out = np.zeros((240, 256), dtype=np.uint8)
-	if nametable_b_out is None:
-		nametable_b_out = np.zeros((240, 256), dtype=np.uint8)
+	if out is None:
+		return im
 
-	# Get tile indexes
+	np.copyto(out, im)
+	return out
 
-	tile_idx_offset = 256 if (ppuctrl & 0b0001_0000) else 0
-	nametable_a_tileidx = np.frombuffer(nametable_a[:960], dtype=np.uint8).reshape((240 // 8, 256 // 8)).astype(np.intp)
-	nametable_b_tileidx = np.frombuffer(nametable_b[:960], dtype=np.uint8).reshape((240 // 8, 256 // 8)).astype(np.intp)
 
-	# Copy tiles from CHR
+def _palettize_tiles(chr_tiles_8x8: np.ndarray, palettes: np.ndarray) -> np.ndarray:
+	"""
+	Apply every palette to every tile
 
-	# TODO optimization: see if this can be numpy optimized
-	# nametable_a_tiles = self._chr_tiles_8x8[nametable_a_tileidx]
-	# nametable_b_tiles = self._chr_tiles_8x8[nametable_b_tileidx]
-	# print(f'{nametable_a_tiles.shape=}')
-	# exit(1)
+	:param chr_tiles_8x8: 2-bit, shape (N, 8, 8)
+	:param palettes: shape (4, 4)
+	:returns: shape (N * 4, 8, 8), indexed by (tile index * 4 + palette index)
+	"""
+	palette_offsets = np.arange(0, 16, 4, dtype=np.uint8).reshape((1, 4, 1, 1))
+	return np.take(palettes, palette_offsets + chr_tiles_8x8[:, None, ...]).reshape((-1, 8, 8))
 
-	for y8 in range(240 // 8):
-		y = y8 * 8
-		for x8 in range(256 // 8):
-			x = x8 * 8
-			nametable_a_out[y : y + 8, x : x + 8] = chr_tiles_8x8[nametable_a_tileidx[y8, x8] + tile_idx_offset, ...]
-			nametable_b_out[y : y + 8, x : x + 8] = chr_tiles_8x8[nametable_b_tileidx[y8, x8] + tile_idx_offset, ...]
 
-	return nametable_a_out, nametable_b_out
+# Shift amount for each metatile within an attribute byte, indexed [y32, y16, x32, x16]
+_ATTRIBUTE_TABLE_SHIFTS: Final = np.array([[0, 2], [4, 6]], dtype=np.uint8).reshape((1, 2, 1, 2))
 
 
-def _palettize_nametable(
-		nametable_data: bytes | bytearray,
-		nametable_chr_2bit: np.ndarray,
-		palettes: np.ndarray,
+def _render_nametable(
+		nametable: bytes | bytearray | memoryview,
+		tiles_palettized: np.ndarray,
 		*,
 		out: np.ndarray | None = None,
 		) -> np.ndarray:
-
-	assert np.amax(nametable_chr_2bit) < 4
-
-	# Each byte contains palettes for 4 16x16 metatiles (i.e. covers a 32x32 total area)
-	# https://www.nesdev.org/wiki/PPU_attribute_tables
-	attribute_table = nametable_data[0x3C0:]
+	"""
+	:param tiles_palettized: from _palettize_tiles(), for the current background pattern table
+	"""
 
 	if out is None:
 		out = np.zeros((240, 256), dtype=np.uint8)
 
-	# TODO: see if this can be numpy optimized
-	for y32 in range(240 // 32 + 1):
-		last_row = (y32 >= 240 // 32)
-
-		y = y32 * 32
-
-		for x32 in range(256 // 32):
-			x = x32 * 32
-
-			palette_byte = attribute_table[x32 + (8 * y32)]
-
-			# Top left & top right metatiles
-
-			palette_idx_tl = (palette_byte & 0b0000_0011)
-			palette_idx_tr = (palette_byte & 0b0000_1100) >> 2
+	# Get tile indexes
+	tile_idx = np.frombuffer(nametable, dtype=np.uint8, count=960).reshape((240 // 8, 256 // 8))
 
-			palette_tl = palettes[palette_idx_tl, :]
-			palette_tr = palettes[palette_idx_tr, :]
+	# Each byte contains palettes for 4 16x16 metatiles (i.e. covers a 32x32 total area)
+	# https://www.nesdev.org/wiki/PPU_attribute_tables
+	attribute_table = np.frombuffer(nametable, dtype=np.uint8, count=64, offset=0x3C0).reshape((8, 8))
 
-			out[y : y + 16, x      : x + 16] = palette_tl[nametable_chr_2bit[y : y + 16, x      : x + 16]]
-			out[y : y + 16, x + 16 : x + 32] = palette_tr[nametable_chr_2bit[y : y + 16, x + 16 : x + 32]]
+	# Decode all attribute bytes at once into a (15, 16) metatile palette index array (the bottom half of the last
+	# attribute row is off the bottom of the screen), then expand to (30, 32) tiles
+	metatile_palette_idx = (attribute_table[:, None, :, None] >> _ATTRIBUTE_TABLE_SHIFTS) & 0b11
+	metatile_palette_idx = metatile_palette_idx.reshape((16, 16))[:15]
+	tile_palette_idx = np.broadcast_to(metatile_palette_idx[:, None, :, None], (15, 2, 16, 2)).reshape((30, 32))
 
-			if last_row:
-				continue
+	# Optimization: tiles have already been palettized, so this is a single gather of all tiles at once, as
+	# (30, 32, 8, 8) - then reorder to (30, 8, 32, 8), which is the same memory layout as (240, 256)
+	tiles = tiles_palettized[(tile_idx.astype(np.intp) << 2) | tile_palette_idx]
+	out.reshape((240 // 8, 8, 256 // 8, 8))[...] = tiles.transpose((0, 2, 1, 3))
 
-			# Bottom left & bottom right metatiles
+	return out
 
-			palette_idx_bl = (palette_byte & 0b0011_0000) >> 4
-			palette_idx_br = (palette_byte & 0b1100_0000) >> 6
 
-			palette_bl = palettes[palette_idx_bl, :]
-			palette_br = palettes[palette_idx_br, :]
+def _make_palettize_frame_luts() -> np.ndarray:
+	"""
+	:returns: RGBA packed into uint32 (in native byte order, i.e. view as uint8 to get RGBA), shape (8, 2, 256),
+	indexed [emphasis, greyscale, palette index]
+	"""
+	idx = np.arange(256)
+	luts = np.full((8, 2, 256, 4), fill_value=255, dtype=np.uint8)
+	for emphasis in range(8):
+		luts[emphasis, 0, :, :3] = NES_PALETTES[emphasis][idx & 0x3F]
+		# https://www.nesdev.org/wiki/PPU_registers#Color_control
+		luts[emphasis, 1, :, :3] = NES_PALETTES[emphasis][idx & 0x30]
+	return luts.view(np.uint32).reshape((8, 2, 256))
 
-			out[y + 16 : y + 32, x      : x + 16] = palette_bl[nametable_chr_2bit[y + 16 : y + 32, x      : x + 16]]
-			out[y + 16 : y + 32, x + 16 : x + 32] = palette_br[nametable_chr_2bit[y + 16 : y + 32, x + 16 : x + 32]]
 
-	return out
+# Optimization: fold greyscale masking into the palette lookup, so palettizing is a single gather
+# Gathering 1 uint32 per pixel is faster than gathering 3 bytes
+_PALETTIZE_FRAME_LUTS: Final[np.ndarray] = _make_palettize_frame_luts()
 
 
-def _palettize_frame(frame_indexed: np.ndarray, ppumask: uint8) -> np.ndarray:
+def _palettize_frame(frame_indexed: np.ndarray, ppumask: uint8, *, out: np.ndarray | None = None) -> np.ndarray:
 	"""
-	:note: frame_indexed may be modified in-place
+	:returns: RGBA packed into uint32, same shape as frame_indexed (view as uint8 to get RGBA)
 	"""
-	greyscale = bool(ppumask & 0b0000_0001)
-	if greyscale:
-		# https://www.nesdev.org/wiki/PPU_registers#Color_control
-		frame_indexed &= 0x30
-
+	greyscale = ppumask & 0b0000_0001
 	emphasis = (ppumask & 0b1110_0000) >> 5
-	assert 0 <= emphasis < 8, f'{emphasis=}'
-	palette = NES_PALETTES[emphasis]
-
-	return palette[frame_indexed]
+	return np.take(_PALETTIZE_FRAME_LUTS[emphasis, greyscale], frame_indexed, out=out)
 
 
 class Renderer:
@@ -197,46 +222,81 @@ class Renderer:
 
 		self._ppu = ppu
 
+		# Optimization: persistent zero-copy views of the nametables in PPU VRAM, instead of slicing (i.e. copying) VRAM
+		# on every render
+		vram = memoryview(ppu.vram)
+		self._nametable_a_data = vram[:0x400]
+		self._nametable_b_data = vram[0x400:0x800]
+
+		# Optimization: likewise, persistent numpy views of palette RAM & OAM sprite Y values
+		self._palette_ram = np.frombuffer(ppu.palette_ram, dtype=np.uint8).reshape((8, 4))
+		self._oam = np.frombuffer(ppu.oam, dtype=np.uint8).reshape((64, 4))
+		self._palettes = np.zeros((8, 4), dtype=np.uint8)
+
 		self._rom_chr = rom_chr
 		self._vertical_mirroring = rom_header.vertical_mirroring
 
 		self._frame_indexed = np.zeros((240, 256), dtype=np.uint8)
-		self._frame_im = np.zeros((240, 256, 3), dtype=np.uint8)
+		# _frame_im is an RGB view of RGBA _frame_rgba (so that _palettize_frame can write uint32 pixels)
+		self._frame_rgba = np.zeros((240, 256, 4), dtype=np.uint8)
+		self._frame_rgba_packed = self._frame_rgba.view(np.uint32).reshape((240, 256))
+		self._frame_im = self._frame_rgba[..., :3]
 
 		self._chr_tiles_8x8 = chr_to_stacked(self._rom_chr)
-		self._chr_tiles_8x16 = chr_to_stacked(self._rom_chr, tall=True)
+		# Optimization: pre-flip sprite tiles once rather than flipping every sprite every frame
+		self._chr_tiles_8x8_flipped = _flip_tiles(self._chr_tiles_8x8)
+		self._chr_tiles_8x16_flipped = _flip_tiles(tiles_8x8_to_8x16(self._chr_tiles_8x8))
+		self._chr_masks_8x8_flipped = self._chr_tiles_8x8_flipped > 0
+		self._chr_masks_8x16_flipped = self._chr_tiles_8x16_flipped > 0
 
 		# TODO: for 8x16 games, it could be better to display CHR in the equivalent order
 		self._chr_im_2bit = chr_to_array(self._rom_chr, width=16)
 		self._chr_im = grey_to_rgb(LUT_2BIT_TO_8BIT[self._chr_im_2bit])
+		# CHR never changes, so get_chr_im() can safely return this array directly
+		self._chr_im.flags.writeable = False
 
-		self._nametable_a_2bit = np.zeros((240, 256), dtype=np.uint8)
-		self._nametable_b_2bit = np.zeros((240, 256), dtype=np.uint8)
 		self._nametable_a_indexed = np.zeros((240, 256), dtype=np.uint8)
 		self._nametable_b_indexed = np.zeros((240, 256), dtype=np.uint8)
 		self._nametables_indexed = np.full((480, 512), fill_value=255, dtype=np.uint8)
+		# Optimization: only re-palettize background tiles, and re-render nametables A & B, if anything they depend on has
+		# changed since last render
+		self._bg_tiles_palettized = np.zeros((256 * 4, 8, 8), dtype=np.uint8)
+		self._bg_tiles_cache_key: tuple | None = None
+		self._nametables_cache_key: tuple | None = None
+		# Same for mirroring nametables A & B into _nametables_indexed (set to None whenever that gets modified)
+		self._nametables_mirror_cache_key: tuple | None = None
 		self._nametable_debug_scroll_rect = np.zeros((480, 512), dtype=np.bool)
+		self._nametable_debug_indexed = np.zeros((480, 512), dtype=np.uint8)
 		self._nametable_debug_im = np.zeros((480, 512, 3), dtype=np.uint8)
 
 		# These arrays will include sprites that are off-screen too, hence why shape isn't (240, 256)
-		# 2nd dimension is depth:
+		# Color & depth are separate arrays (rather than 1 array with 2 channels) so that each is contiguous
+		# Depth:
 		#   0 = background
 		#   1 = behind background
 		#   -1 (255) = in front of background
 		# TODO: Try type np.int8 instead
-		self._sprite_layer_indexed = np.zeros((256 + 16, 256 + 7, 2), dtype=np.uint8)
+		self._sprite_layer_indexed = np.zeros((256 + 16, 256 + 7), dtype=np.uint8)
+		self._sprite_layer_depth = np.zeros((256 + 16, 256 + 7), dtype=np.uint8)
+		self._sprite_layer_debug_indexed = np.zeros((256 + 16, 256 + 7), dtype=np.uint8)
 		self._sprite_layer_debug_im = np.zeros((256 + 16, 256 + 7, 3), dtype=np.uint8)
+		self._sprite_outline_mask = np.zeros((256 + 16, 256 + 7), dtype=np.bool)
 
 		self._sprites_debug_indexed = np.zeros((64, 64), dtype=np.uint8)
 		self._sprites_debug_im = np.zeros((64, 64, 3), dtype=np.uint8)
 
+		# Optimization: debug images are only converted to RGB when requested (and only once per render), rather than
+		# every time render_frame() is called
+		self._debug_ims_dirty = False
+		self._sprite_zero_outline: tuple[int, int, int] = (0, 0, 8)
+
 		self._full_palette_debug_im = np.arange(64, dtype=np.uint8).reshape((4, 16))
 		self._full_palette_debug_im = NES_PALETTE_MAIN[self._full_palette_debug_im]
 		assert self._full_palette_debug_im.shape == (4, 16, 3)
 
 		self._current_palette_debug_im = np.zeros((2, 16, 3), dtype=np.uint8)
 
-		self._ppu_debug_im = ppu.debug_status_im.reshape((ppu.debug_status_im.shape[0], 1, 3)).copy()
+		self._ppu_debug_im = np.zeros((TOTAL_ROWS, 1, 3), dtype=np.uint8)
 		self._sprite_zero_debug_im = ppu.sprite_zero_debug_im.copy()
 
 		if save_chr:
@@ -255,12 +315,15 @@ class Renderer:
 		return self._frame_im
 
 	def get_nametables_debug_im(self) -> np.ndarray:
+		self._update_debug_ims()
 		return self._nametable_debug_im
 
 	def get_sprites_debug_im(self) -> np.ndarray:
+		self._update_debug_ims()
 		return self._sprites_debug_im
 
 	def get_sprite_layer_debug_im(self) -> np.ndarray:
+		self._update_debug_ims()
 		return self._sprite_layer_debug_im
 
 	def get_current_palettes_debug_im(self) -> np.ndarray:
@@ -275,48 +338,78 @@ class Renderer:
 	def get_sprite_zero_debug_im(self) -> np.ndarray:
 		return self._sprite_zero_debug_im
 
+	def _update_debug_ims(self) -> None:
+		"""
+		Convert indexed debug images to RGB, if anything has been rendered since last time
+		"""
+
+		if not self._debug_ims_dirty:
+			return
+		self._debug_ims_dirty = False
+
+		np.take(NES_PALETTE_MAIN, self._nametable_debug_indexed, axis=0, out=self._nametable_debug_im)
+		self._nametable_debug_im[self._nametable_debug_scroll_rect] = (255, 0, 255)
+
+		np.take(_NES_PALETTE_MAIN_CLAMPED, self._sprites_debug_indexed, axis=0, out=self._sprites_debug_im)
+
+		sprites_im = self._sprite_layer_debug_im
+		np.take(NES_PALETTE_MAIN, self._sprite_layer_debug_indexed, axis=0, out=sprites_im)
+		sprites_im[self._sprite_outline_mask, ...] = (255, 0, 255)
+
+		# Special outline for sprite 0
+		sprite_zero_x, sprite_zero_y, sprite_zero_h = self._sprite_zero_outline
+		draw_rectangle(sprites_im, (0, 255, 0), sprite_zero_x, sprite_zero_y, 8, sprite_zero_h)
+
 	def _render_nametables(self, *, bg_palettes: np.ndarray, bg_color: int, start_row: int, end_row: int) -> None:
 
-		vram = self._ppu.vram
 		ppuctrl = self._ppu.ppuctrl
 
-		nametable_a = vram[:0x400]
-		nametable_b = vram[0x400:0x800]
-
-		# Populate nametable tiles (2-bit out)
-		_populate_nametable_tiles(
-			nametable_a=nametable_a,
-			nametable_b=nametable_b,
-			nametable_a_out=self._nametable_a_2bit,
-			nametable_b_out=self._nametable_b_2bit,
-			chr_tiles_8x8=self._chr_tiles_8x8,
-			ppuctrl=ppuctrl,
-		)
-
-		# Apply palettes (2-bit -> 6-bit)
-		_palettize_nametable(
-			nametable_data=nametable_a, nametable_chr_2bit=self._nametable_a_2bit, palettes=bg_palettes,
-			out=self._nametable_a_indexed)
-		_palettize_nametable(
-			nametable_data=nametable_b, nametable_chr_2bit=self._nametable_b_2bit, palettes=bg_palettes,
-			out=self._nametable_b_indexed)
+		# Of PPUCTRL, only background pattern table address matters here
+		bg_tiles_cache_key = (ppuctrl & 0b0001_0000, bg_palettes.tobytes())
+
+		if bg_tiles_cache_key != self._bg_tiles_cache_key:
+			self._bg_tiles_cache_key = bg_tiles_cache_key
+
+			# Apply palettes to tiles (2-bit -> 6-bit)
+			tile_idx_offset = 256 if (ppuctrl & 0b0001_0000) else 0
+			self._bg_tiles_palettized = _palettize_tiles(
+				self._chr_tiles_8x8[tile_idx_offset : tile_idx_offset + 256], bg_palettes)
+
+		# Nametable contents are tracked by PPU write counter rather than compared directly
+		cache_key = (self._ppu.nametable_write_count, bg_tiles_cache_key)
+
+		if cache_key != self._nametables_cache_key:
+			self._nametables_cache_key = cache_key
+
+			# Populate nametables from palettized tiles
+			_render_nametable(self._nametable_a_data, self._bg_tiles_palettized, out=self._nametable_a_indexed)
+			_render_nametable(self._nametable_b_data, self._bg_tiles_palettized, out=self._nametable_b_indexed)
 
 		# TODO: attribute table debug palette image
 
 		# Apply mirroring
-		self._nametables_indexed = _mirror(
-			a=self._nametable_a_indexed, b=self._nametable_b_indexed, ppuctrl=ppuctrl, vertical=self._vertical_mirroring)
+		# Of PPUCTRL, only base nametable bits matter here
+		mirror_cache_key = (cache_key, ppuctrl & 0b0000_0011)
+		if mirror_cache_key != self._nametables_mirror_cache_key:
+			self._nametables_mirror_cache_key = mirror_cache_key
+			_mirror(
+				a=self._nametable_a_indexed, b=self._nametable_b_indexed, ppuctrl=ppuctrl,
+				vertical=self._vertical_mirroring, out=self._nametables_indexed)
 
-		self._make_nametable_debug_image(bg_color, start_row=start_row, end_row=end_row)
+		if self._ppu.debug_enabled:
+			self._make_nametable_debug_image(bg_color, start_row=start_row, end_row=end_row)
 
 	def _make_nametable_debug_image(self, bg_color: uint8, start_row: int, end_row: int):
 
 		ppu = self._ppu
 		ppuctrl = ppu.ppuctrl
 
-		nametables_with_bg = self._nametables_indexed.copy()
+		# Un-apply nametable select in debug nametable image
+		# Optimization: do this while still indexed (and into a persistent buffer), rather than on the RGB image
+		nametables_with_bg = _apply_unapply_nametable_select(
+			self._nametables_indexed, ppuctrl=ppuctrl, vertical_mirroring=self._vertical_mirroring,
+			out=self._nametable_debug_indexed)
 		nametables_with_bg[nametables_with_bg == 255] = bg_color
-		self._nametable_debug_im = NES_PALETTE_MAIN[nametables_with_bg]
 
 		# Draw scroll area on debug nametable image
 
@@ -324,10 +417,6 @@ class Renderer:
 
 		# draw_rectangle(self._nametable_debug_im, (255, 0, 255), ppu.scroll_x, ppu.scroll_y, 256, 240, wrap=True)
 
-		# Un-apply nametable select in debug nametable image
-		self._nametable_debug_im = _apply_unapply_nametable_select(
-			self._nametable_debug_im, ppuctrl=ppuctrl, vertical_mirroring=self._vertical_mirroring)
-
 		x = ppu.scroll_x
 		y = ppu.scroll_y + start_row
 
@@ -344,7 +433,7 @@ class Renderer:
 		# 	self._nametable_debug_scroll_rect, ppuctrl=ppuctrl, vertical_mirroring=self._vertical_mirroring)
 
 		draw_rectangle(self._nametable_debug_scroll_rect, True, x, y, w, h, wrap=True)
-		self._nametable_debug_im[self._nametable_debug_scroll_rect] = (255, 0, 255)
+		self._debug_ims_dirty = True
 
 		# self._nametable_debug_scroll_rect = _apply_unapply_nametable_select(
 		# 	self._nametable_debug_scroll_rect, ppuctrl=ppuctrl, vertical_mirroring=self._vertical_mirroring)
@@ -371,84 +460,103 @@ class Renderer:
 		tile_idx_offset_8x8 = 256 if sprite_pattern_table_select else 0
 
 		sprites_indexed = self._sprite_layer_indexed
+		sprites_depth = self._sprite_layer_depth
 		sprites_debug_indexed = self._sprites_debug_indexed
+		outline_mask = self._sprite_outline_mask
 
-		if first_segment:
-			sprites_indexed.fill(0)
+		# Optimization: skip debug images entirely if debug is disabled
+		debug = self._ppu.debug_enabled
+
+		if first_segment and debug:
 			sprites_debug_indexed.fill(0)
 
-		outline_mask = np.zeros((256 + 16, 256 + 7), dtype=np.bool)
+		if debug:
+			outline_mask.fill(False)
 
 		assert len(oam) == 256
-		for sprite_idx in reversed(range(64)):
 
-			y, tile_idx, flags, x = oam[4*sprite_idx : 4*(sprite_idx + 1)]
-
-			# Sprite Y values are offset by 1 (https://www.nesdev.org/wiki/PPU_OAM#Byte_0)
-			# Technically it might be more accurate to apply this during compositing later, but this is a lot simpler
-			y += 1
-
-			if (not render_offscreen_sprites) and not (start_row - h <= y < end_row):
-				continue
-
-			flip_v = flags & 0b1000_0000
-			flip_h = flags & 0b0100_0000
-			depth = 1 if (flags & 0b0010_0000) else 255
-			palette_idx = flags & 0x03
-
-			if sprites_8x16:
-				tile = self._chr_tiles_8x16[tile_idx]
-			else:
-				tile = self._chr_tiles_8x8[tile_idx + tile_idx_offset_8x8]
-
-			if flip_v:
-				tile = np.flipud(tile)
-
-			if flip_h:
-				tile = np.fliplr(tile)
-
-			tile_palettized = sprite_palettes[palette_idx, ...][tile]
-			tile_mask = tile > 0
-			sprites_indexed[y : y + h, x : x + 8, 0][tile_mask] = tile_palettized[tile_mask]
-			sprites_indexed[y : y + h, x : x + 8, 1][tile_mask] = depth
-
-			# TODO: different color depending on sprite flags, a bit like for sprite 0
-			# (need to make outline_mask RGB instead of bool)
-			draw_rectangle(outline_mask, True, x, y, 8, h)
-
-			ys, xs = divmod(sprite_idx, 8)
-			xs *= 8
-			ys *= 8
-			# If 8x16, will only put top tile into _sprites_debug_im (TODO: both)
-			sprites_debug_indexed[ys : ys + 8, xs : xs + 8] = tile_palettized[:8, ...]
-
-		sprites_debug_indexed[sprites_debug_indexed >= 64] = 0
-		self._sprites_debug_im = NES_PALETTE_MAIN[sprites_debug_indexed]
-
-		sprites_im = sprites_indexed[..., 0].copy()
-		sprite_im_bg = sprites_indexed[..., 1] == 0
+		if render_offscreen_sprites:
+			sprite_idxs = np.arange(64)
+		else:
+			# Optimization: find visible sprites all at once, and only process those
+			# (Sprite Y values are offset by 1, see below)
+			sprite_ys = self._oam[:, 0].astype(np.intp)
+			visible = (sprite_ys >= start_row - h - 1) & (sprite_ys < end_row - 1)
+			sprite_idxs = np.flatnonzero(visible)
+
+		# Optimization: process all sprites at once rather than looping over them
+
+		sprites = self._oam[sprite_idxs]
+
+		# Sprite Y values are offset by 1 (https://www.nesdev.org/wiki/PPU_OAM#Byte_0)
+		# Technically it might be more accurate to apply this during compositing later, but this is a lot simpler
+		y = sprites[:, 0].astype(np.intp) + 1
+		tile_idx = sprites[:, 1].astype(np.intp)
+		flags = sprites[:, 2]
+		x = sprites[:, 3].astype(np.intp)
+
+		flip = flags >> 6
+		depth = np.where(flags & 0b0010_0000, np.uint8(1), np.uint8(255))
+		palette_idx = flags & 0x03
+
+		if sprites_8x16:
+			tiles = self._chr_tiles_8x16_flipped[tile_idx, flip]
+			tile_masks = self._chr_masks_8x16_flipped[tile_idx, flip]
+		else:
+			tile_idx += tile_idx_offset_8x8
+			tiles = self._chr_tiles_8x8_flipped[tile_idx, flip]
+			tile_masks = self._chr_masks_8x8_flipped[tile_idx, flip]
+
+		tiles_palettized = sprite_palettes[palette_idx[:, None, None], tiles]
+
+		# Flat index into sprite layer of every opaque sprite pixel, in sprite order
+		layer_width = sprites_indexed.shape[1]
+		rows = y[:, None, None] + np.arange(h)[None, :, None]
+		cols = x[:, None, None] + np.arange(8)[None, None, :]
+		pixel_idx = (rows * layer_width + cols)[tile_masks]
+
+		# Where sprites overlap, the lowest index sprite has priority, i.e. take first occurrence of each pixel
+		pixel_idx, first = np.unique(pixel_idx, return_index=True)
+		sprites_indexed.ravel()[pixel_idx] = tiles_palettized[tile_masks][first]
+		sprites_depth.ravel()[pixel_idx] = np.broadcast_to(depth[:, None, None], tile_masks.shape)[tile_masks][first]
+
+		if not debug:
+			return
+
+		# TODO: different color depending on sprite flags, a bit like for sprite 0
+		# (need to make outline_mask RGB instead of bool)
+		_draw_sprite_outlines(outline_mask, x=x, y=y, h=h)
+
+		# Sprites debug image is an 8x8 grid of sprites
+		# If 8x16, will only put top tile into _sprites_debug_im (TODO: both)
+		sprites_debug_indexed.reshape((8, 8, 8, 8))[sprite_idxs >> 3, :, sprite_idxs & 7, :] = tiles_palettized[:, :8, :]
+
+		# Optimization: build debug image in persistent buffers rather than allocating new arrays every frame
+		sprites_im = self._sprite_layer_debug_indexed
+		np.copyto(sprites_im, sprites_indexed)
+		sprite_im_bg = sprites_depth == 0
 		sprites_im[sprite_im_bg] = 0x0F
 		sprites_im[:240, :256][sprite_im_bg[:240, :256]] = 0
-		sprites_im = NES_PALETTE_MAIN[sprites_im]
-
-		sprites_im[np.logical_and(outline_mask, sprite_im_bg), ...] = (255, 0, 255)
-
-		# Special outline for sprite 0
-		draw_rectangle(sprites_im, (0, 255, 0), oam[3], oam[0] + 1, 8, 16 if sprites_8x16 else 8)
 
-		self._sprite_layer_debug_im = sprites_im
+		# Outlines are only drawn over background; the rest is drawn in _update_debug_ims()
+		np.logical_and(outline_mask, sprite_im_bg, out=outline_mask)
+		self._sprite_zero_outline = (int(oam[3]), int(oam[0]) + 1, 16 if sprites_8x16 else 8)
+		self._debug_ims_dirty = True
 
 	def _load_palettes(self) -> np.ndarray:
 
-		palettes = np.frombuffer(self._ppu.palette_ram, dtype=np.uint8).reshape((8, 4)).copy()
+		# Optimization: copy into persistent buffer rather than allocating new array every frame
+		palettes = self._palettes
+		np.copyto(palettes, self._palette_ram)
 		bg_color = palettes[0, 0]
-		for idx in range(4):
-			palettes[4 + idx, 0] = palettes[idx, 0]
 
-		# Make palette image before applying background colors
-		palette_ram_idxs = palettes.reshape((2, 16))
-		self._current_palette_debug_im = NES_PALETTE_MAIN[palette_ram_idxs]
-		assert self._current_palette_debug_im.shape == (2, 16, 3)
+		if self._ppu.debug_enabled:
+			# Sprite palette entry 0 mirrors background palette entry 0 (only matters for debug image)
+			palettes[4:, 0] = palettes[:4, 0]
+
+			# Make palette image before applying background colors
+			palette_ram_idxs = palettes.reshape((2, 16))
+			np.take(NES_PALETTE_MAIN, palette_ram_idxs, axis=0, out=self._current_palette_debug_im)
 
 		# Value 255 indicates a transparent pixel
 		palettes[:, 0] = 255
@@ -476,12 +584,13 @@ class Renderer:
 			nametables_onscreen = self._nametables_indexed[scroll_y : 240 + scroll_y, scroll_x : 256 + scroll_x]
 			if not bg_left_8_pixels:
 				nametables_onscreen[start_row:end_row, :8] = 255
+				self._nametables_mirror_cache_key = None
 
 		sprites_onscreen = None
 		sprite_depth = None
 		if render_sprites:
-			sprites_onscreen = self._sprite_layer_indexed[:240, :256, 0]
-			sprite_depth     = self._sprite_layer_indexed[:240, :256, 1]
+			sprites_onscreen = self._sprite_layer_indexed[:240, :256]
+			sprite_depth     = self._sprite_layer_depth[:240, :256]
 			if not sprites_left_8_pixels:
 				sprite_depth[start_row:end_row, :8] = 0
 
@@ -495,26 +604,35 @@ class Renderer:
 		if first_segment:
 			self._frame_indexed.fill(bg_color)
 
-		# Background sprites
+		if not (render_sprites or render_bg):
+			return
+
+		# Optimization: composite with cascaded np.where, then write to frame once, rather than 3 boolean mask
+		# gather/scatter passes over the frame (about 3x faster)
+
+		frame_segment = self._frame_indexed[start_row:end_row, ...]
+		composite = frame_segment
+
 		if render_sprites:
 			assert sprites_onscreen is not None
-			sprites_bg_mask = (sprite_depth[start_row:end_row, ...] == 1)
-			self._frame_indexed[start_row:end_row, ...][sprites_bg_mask] = \
-				sprites_onscreen[start_row:end_row, ...][sprites_bg_mask]
+			sprites_onscreen = sprites_onscreen[start_row:end_row, ...]
+			sprite_depth = sprite_depth[start_row:end_row, ...]
+
+		# Background sprites
+		if render_sprites:
+			composite = np.where(sprite_depth == 1, sprites_onscreen, composite)
 
 		# Background nametables
 		if render_bg:
 			assert nametables_onscreen is not None
-			nametable_nonbg_mask = (nametables_onscreen[start_row:end_row, ...] < 64)
-			self._frame_indexed[start_row:end_row, ...][nametable_nonbg_mask] = \
-				nametables_onscreen[start_row:end_row, ...][nametable_nonbg_mask]
+			nametables_onscreen = nametables_onscreen[start_row:end_row, ...]
+			composite = np.where(nametables_onscreen < 64, nametables_onscreen, composite)
 
 		# Foreground sprites
 		if render_sprites:
-			assert sprites_onscreen is not None
-			sprites_fg_mask = (sprite_depth[start_row:end_row, ...] == 255)
-			self._frame_indexed[start_row:end_row, ...][sprites_fg_mask] = \
-				sprites_onscreen[start_row:end_row, ...][sprites_fg_mask]
+			composite = np.where(sprite_depth == 255, sprites_onscreen, composite)
+
+		frame_segment[...] = composite
 
 	def render_frame(self, start_row: int, end_row: int):
 
@@ -523,7 +641,12 @@ class Renderer:
 		entire_frame = first_segment and last_segment
 
 		if first_segment:
-			self._nametable_debug_scroll_rect.fill(False)
+			# Clear sprite layer here rather than in _render_sprites(), as that may be skipped for this segment but not
+			# for later ones
+			self._sprite_layer_indexed.fill(0)
+			self._sprite_layer_depth.fill(0)
+			if self._ppu.debug_enabled:
+				self._nametable_debug_scroll_rect.fill(False)
 
 		# FIXME: for some reason this can flicker with split-screen rendering
 		# e.g. in SMB, once we scroll past the first screen - something is wrong with base nametable getting set to 1
@@ -536,26 +659,33 @@ class Renderer:
 		# TODO: make PPU getter functions instead of accessing members directly (and make the members private)
 		ppu = self._ppu
 
-		# We could return early if PPUMASK rendering disabled, but then debug images would not get made
-
 		# Load palettes
 		bg_color, bg_palettes, sprite_palettes = self._load_palettes()
 
-		# Make nametable (background) images
-		self._render_nametables(bg_palettes=bg_palettes, bg_color=bg_color, start_row=start_row, end_row=end_row)
-		# TODO: with split screen scroll, draw scroll area for just this region onto nametables
+		# Optimization: if PPUMASK rendering is disabled, the frame is just background color, so we only need to render
+		# nametables & sprites for the debug images
+		if (ppu.ppumask & 0b0001_1000) or ppu.debug_enabled:
+
+			# Make nametable (background) images
+			self._render_nametables(bg_palettes=bg_palettes, bg_color=bg_color, start_row=start_row, end_row=end_row)
+			# TODO: with split screen scroll, draw scroll area for just this region onto nametables
 
-		# Sprites
-		self._render_sprites(sprite_palettes=sprite_palettes, start_row=start_row, end_row=end_row)
+			# Sprites
+			self._render_sprites(sprite_palettes=sprite_palettes, start_row=start_row, end_row=end_row)
 
 		# Composite background & sprites into frame
 		self._composite_layers(bg_color=bg_color, start_row=start_row, end_row=end_row)
 
 		# Palettize
-		self._frame_im[start_row:end_row, ...] = _palettize_frame(self._frame_indexed[start_row:end_row, ...], ppumask=ppu.ppumask)
+		_palettize_frame(
+			self._frame_indexed[start_row:end_row, ...],
+			ppumask=ppu.ppumask,
+			out=self._frame_rgba_packed[start_row:end_row, ...])
 
 		if last_segment:
-			# Grab debug images from PPU
-			self._ppu_debug_im = ppu.debug_status_im.reshape((ppu.debug_status_im.shape[0], 1, 3)).copy()
-			self._sprite_zero_debug_im = ppu.sprite_zero_debug_im.copy()
+			if ppu.debug_enabled:
+				# Grab debug images from PPU
+				# Optimization: copy into the existing arrays rather than allocating new ones
+				np.copyto(self._ppu_debug_im, ppu.get_debug_status_im().reshape(self._ppu_debug_im.shape))
+				np.copyto(self._sprite_zero_debug_im, ppu.sprite_zero_debug_im)
 			ppu.done_rendering()
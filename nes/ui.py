@@ -26,6 +26,9 @@ KEY_BINDINGS: dict = {
 }
 
 
+DEBUG_VIEW_KEY: Final[int] = pygame.K_F1
+
+
 FPS_TEXT_FONT_SIZE: Final[int] = 18
 
 
@@ -33,7 +36,10 @@ BG_COLOR: Final = (63, 63, 63)
 
 
 class Ui:
-	def __init__(self, controllers: Controllers, renderer: Renderer):
+	def __init__(self, controllers: Controllers, renderer: Renderer, debug_view: bool = True):
+		"""
+		:param debug_view: show debug images alongside frame (can be toggled with DEBUG_VIEW_KEY)
+		"""
 
 		self.running = False
 
@@ -42,21 +48,32 @@ class Ui:
 		self.controllers = controllers
 		self.renderer = renderer
 
-		self.screen = pygame.display.set_mode((128 + 512 + 8 + 512, 480 + 256 + 8))
+		self.debug_view = debug_view
+		self.screen = self._set_mode()
 
 		self.font = pygame.freetype.SysFont(
 			pygame.freetype.get_default_font(),
 			FPS_TEXT_FONT_SIZE, bold=False, italic=False)
 
-		self.chr_surf = array_to_surface(self.renderer.get_chr_im())
-		self.current_palette_surf = array_to_surface(self.renderer.get_current_palettes_debug_im(), 8)
-		self.full_palette_surf = array_to_surface(self.renderer.get_full_palette_debug_im(), 8)
-		self.nametable_surf = array_to_surface(self.renderer.get_nametables_debug_im())
-		self.sprite_layer_surf = array_to_surface(self.renderer.get_sprite_layer_debug_im())
-		self.sprites_surf = array_to_surface(self.renderer.get_sprites_debug_im(), 2)
-		self.frame_surf = array_to_surface(self.renderer.get_frame_im(), 2)
-		self.ppu_debug_surf = array_to_surface(self.renderer.get_ppu_debug_im(), (2, 8))
-		self.sprite_zero_debug_surf = array_to_surface(self.renderer.get_sprite_zero_debug_im(), 4)
+		self.chr_surf = self._make_surface(self.renderer.get_chr_im())
+		self.nametable_surf = self._make_surface(self.renderer.get_nametables_debug_im())
+		self.sprite_layer_surf = self._make_surface(self.renderer.get_sprite_layer_debug_im())
+
+		# Optimization: upscale with pygame (from a 1x surface into a persistent scaled surface), rather than upscaling
+		# the array with numpy every frame (about 7x faster)
+		self.current_palette_surf_1x = self._make_surface(self.renderer.get_current_palettes_debug_im())
+		self.full_palette_surf_1x = self._make_surface(self.renderer.get_full_palette_debug_im())
+		self.sprites_surf_1x = self._make_surface(self.renderer.get_sprites_debug_im())
+		self.frame_surf_1x = self._make_surface(self.renderer.get_frame_im())
+		self.ppu_debug_surf_1x = self._make_surface(self.renderer.get_ppu_debug_im())
+		self.sprite_zero_debug_surf_1x = self._make_surface(self.renderer.get_sprite_zero_debug_im())
+
+		self.current_palette_surf = self._make_scaled_surface(self.current_palette_surf_1x, 8)
+		self.full_palette_surf = self._make_scaled_surface(self.full_palette_surf_1x, 8)
+		self.sprites_surf = self._make_scaled_surface(self.sprites_surf_1x, 2)
+		self.frame_surf = self._make_scaled_surface(self.frame_surf_1x, 2)
+		self.ppu_debug_surf = self._make_scaled_surface(self.ppu_debug_surf_1x, (2, 8))
+		self.sprite_zero_debug_surf = self._make_scaled_surface(self.sprite_zero_debug_surf_1x, 4)
 
 		pygame.display.set_caption('NES Emulator')
 
@@ -64,21 +81,71 @@ class Ui:
 		logging.info(f'Display info:\n{info}')
 
 		self.screen.fill(BG_COLOR)
-		self.screen.blit(self.chr_surf, (0, 0))
+		if self.debug_view:
+			self.screen.blit(self.chr_surf, (0, 0))
 		pygame.display.flip()
 
 		self.running = True
 
+	def _set_mode(self) -> pygame.Surface:
+		if self.debug_view:
+			return pygame.display.set_mode((128 + 512 + 8 + 512, 480 + 256 + 8))
+		else:
+			return pygame.display.set_mode((512, 480))
+
+	@staticmethod
+	def _make_surface(arr) -> pygame.Surface:
+		# Optimization: convert to display pixel format once, so blits don't need to convert every frame
+		return array_to_surface(arr).convert()
+
+	@staticmethod
+	def _make_scaled_surface(surf_1x: pygame.Surface, scale: int | tuple[int, int]) -> pygame.Surface:
+		"""
+		:param scale: either a single int, or (y, x)
+		"""
+		scale_y, scale_x = (scale, scale) if isinstance(scale, int) else scale
+		width, height = surf_1x.get_size()
+		return pygame.transform.scale(surf_1x, (width * scale_x, height * scale_y)).convert()
+
+	@staticmethod
+	def _update_scaled_surface(arr, surf_1x: pygame.Surface, surf: pygame.Surface) -> None:
+		array_to_surface(arr, into=surf_1x)
+		# pygame.transform.scale is nearest-neighbour
+		pygame.transform.scale(surf_1x, surf.get_size(), surf)
+
 	def draw(self, fps_str: str = '') -> None:
 
 		self.screen.fill(BG_COLOR)
 
+		self._update_scaled_surface(self.renderer.get_frame_im(), self.frame_surf_1x, self.frame_surf)
+
+		if not self.debug_view:
+			self.screen.blit(self.frame_surf, (0, 0))
+		else:
+			self.screen.blit(self.frame_surf, (128, 0))
+			self._draw_debug()
+
+		if fps_str:
+			lines = fps_str.splitlines()
+			screen_height = self.screen.get_height()
+			for idx, line in enumerate(reversed(lines)):
+				self.font.render_to(
+					self.screen,
+					(0, screen_height - FPS_TEXT_FONT_SIZE * (idx + 1)),
+					line,
+					(255, 0, 0))
+			# self.font.render_to(self.screen, (0, 480 + 256 + 8 - FPS_TEXT_FONT_SIZE * len(lines)), fps_str, (255, 0, 0))
+
+	def _draw_debug(self) -> None:
+
 		self.screen.blit(self.chr_surf, (0, 0))
 
-		array_to_surface(self.renderer.get_current_palettes_debug_im(), 8, into=self.current_palette_surf)
+		self._update_scaled_surface(
+			self.renderer.get_current_palettes_debug_im(), self.current_palette_surf_1x, self.current_palette_surf)
 		self.screen.blit(self.current_palette_surf, (0, 256))
 
-		array_to_surface(self.renderer.get_full_palette_debug_im(), 8, into=self.full_palette_surf)
+		self._update_scaled_surface(
+			self.renderer.get_full_palette_debug_im(), self.full_palette_surf_1x, self.full_palette_surf)
 		self.screen.blit(self.full_palette_surf, (0, 256 + 16))
 
 		array_to_surface(self.renderer.get_nametables_debug_im(), into=self.nametable_surf)
@@ -87,28 +154,16 @@ class Ui:
 		array_to_surface(self.renderer.get_sprite_layer_debug_im(), into=self.sprite_layer_surf)
 		self.screen.blit(self.sprite_layer_surf, (128 + 512 + 8, 480))
 
-		array_to_surface(self.renderer.get_sprites_debug_im(), 2, into=self.sprites_surf)
+		self._update_scaled_surface(self.renderer.get_sprites_debug_im(), self.sprites_surf_1x, self.sprites_surf)
 		self.screen.blit(self.sprites_surf, (128 + 512 + 256 + 8 + 8, 480))
 
-		array_to_surface(self.renderer.get_frame_im(), 2, into=self.frame_surf)
-		self.screen.blit(self.frame_surf, (128, 0))
-
-		array_to_surface(self.renderer.get_ppu_debug_im(), (2, 8), into=self.ppu_debug_surf)
+		self._update_scaled_surface(self.renderer.get_ppu_debug_im(), self.ppu_debug_surf_1x, self.ppu_debug_surf)
 		self.screen.blit(self.ppu_debug_surf, (128 + 512, 0))
 
-		array_to_surface(self.renderer.get_sprite_zero_debug_im(), 4, into=self.sprite_zero_debug_surf)
+		self._update_scaled_surface(
+			self.renderer.get_sprite_zero_debug_im(), self.sprite_zero_debug_surf_1x, self.sprite_zero_debug_surf)
 		self.screen.blit(self.sprite_zero_debug_surf, (128 + 512 + 256 + 8 + 8, 480 + 128))
 
-		if fps_str:
-			lines = fps_str.splitlines()
-			for idx, line in enumerate(reversed(lines)):
-				self.font.render_to(
-					self.screen,
-					(0, 480 + 256 + 8 - FPS_TEXT_FONT_SIZE * (idx + 1)),
-					line,
-					(255, 0, 0))
-			# self.font.render_to(self.screen, (0, 480 + 256 + 8 - FPS_TEXT_FONT_SIZE * len(lines)), fps_str, (255, 0, 0))
-
 	def flip(self):
 		pygame.display.flip()
 
@@ -122,6 +177,14 @@ class Ui:
 					self._handle_key(event)
 
 	def _handle_key(self, event):
+
+		if event.key == DEBUG_VIEW_KEY:
+			if event.type == pygame.KEYDOWN:
+				self.debug_view = not self.debug_view
+				logger.info(f'Debug view {"enabled" if self.debug_view else "disabled"}')
+				self.screen = self._set_mode()
+			return
+
 		button = KEY_BINDINGS.get(event.key)
 		if button is not None:
 			down = (event.type == pygame.KEYDOWN)
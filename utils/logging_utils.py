@@ -22,10 +22,13 @@ FORMATTERS: Final = {
 	level: logging.Formatter(fmt) for level, fmt in LEVEL_FORMATS.items()
 }
 
+# For custom log levels not in FORMATTERS
+_DEFAULT_FORMATTER: Final = logging.Formatter(FORMAT)
+
 
 class CustomFormatter(logging.Formatter):
 	def format(self, record):
-		return FORMATTERS.get(record.levelno).format(record)
+		return FORMATTERS.get(record.levelno, _DEFAULT_FORMATTER).format(record)
 
 
 def init_logging(